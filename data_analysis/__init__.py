@@ -1,4 +1,43 @@
-from .analyzer import Analyzer
-from .dataloader import DataLoader, FileDataLoader, DirDataLoader
-from .filter_sequence import FilterSequence
-from .data_filter import *
+import importlib
+
+# the public names are imported on first access (PEP 562), so `import data_analysis` doesn't pay for pandas,
+# matplotlib or spaCy before they are needed
+_LAZY_NAMES = {
+    "Analyzer": ".analyzer",
+    "DataLoader": ".dataloader",
+    "FileDataLoader": ".dataloader",
+    "DirDataLoader": ".dataloader",
+    "FilterSequence": ".filter_sequence",
+    "PhraseMoralMatrix": ".matrix",
+    "MoralCube": ".cube",
+    "PhraseIndex": ".phrase_index",
+    "FilterCache": ".filter_cache",
+    "LexiconAutomaton": ".lexicon",
+    "PartitionedDataset": ".partitioned",
+}
+# everything else is looked up in the filters
+_FILTER_MODULE = ".data_filter"
+_FILTER_NAMES = ["DataFilter", "MoralDistributionFilter", "PhraseCrossOverFilter", "MoralCoOccurrenceFilter", "RegExFilter",
+                 "LexiconTagFilter", "ConcatDataFrames", "ConcatMultipleDataFrames", "SumUpSeries",
+                 "SeriesToDataFrameAdapter", "DataFrameToSeriesList", "Void"]
+
+__all__ = list(_LAZY_NAMES) + _FILTER_NAMES
+
+
+def __getattr__(name: str):
+    if name in _LAZY_NAMES:
+        module = importlib.import_module(_LAZY_NAMES[name], __name__)
+    elif not name.startswith("_"):
+        module = importlib.import_module(_FILTER_MODULE, __name__)
+        if not hasattr(module, name):
+            raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(module, name)
+    # cache it, __getattr__ is only called for missing names
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
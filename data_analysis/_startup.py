@@ -0,0 +1,62 @@
+"""
+Checks the startup budget of the package: every statement below is timed in a fresh interpreter with
+`python -X importtime` and must stay within its budget without importing any of the heavy modules.
+
+    python -m data_analysis._startup
+"""
+import re
+import subprocess
+import sys
+
+# statement -> budget in seconds
+STARTUP_BUDGETS = {
+    "import data_analysis": 0.02,
+    "from data_analysis import Analyzer, DataLoader, FilterSequence": 1.5,
+}
+# modules that may only be imported once they are actually used
+HEAVY_MODULES = ("spacy", "matplotlib")
+
+IMPORT_TIME_PATTERN = re.compile(r"^import time:\s+\d+ \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def measure(statement: str) -> tuple[float, list[str]]:
+    """
+    runs a statement in a fresh interpreter.
+    :param statement: python statement, eg. an import
+    :return: tuple of the cumulative import time in seconds and the heavy modules it imported
+    """
+    code = f"{statement}\nimport sys\nprint(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                            check=True)
+    total = 0
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_PATTERN.match(line)
+        # only top level imports, their time includes all nested imports
+        if match and len(match.group(2)) == 1:
+            total += int(match.group(1))
+    heavy = [module for module in result.stdout.strip().split(",") if module]
+    return total / 1e6, heavy
+
+
+def check_budgets(budgets: dict = None) -> bool:
+    """
+    measures every statement and prints a report.
+    :param budgets: dict mapping statements to budgets in seconds, defaults to STARTUP_BUDGETS
+    :return: True if all statements are within their budget
+    """
+    budgets = budgets or STARTUP_BUDGETS
+    # the interpreter itself imports some modules on startup, they don't count
+    baseline, _ = measure("pass")
+    ok = True
+    for statement, budget in budgets.items():
+        seconds, heavy = measure(statement)
+        seconds = max(seconds - baseline, 0.0)
+        within = seconds <= budget and not heavy
+        ok = ok and within
+        print(f"{'ok  ' if within else 'FAIL'} {seconds:.3f}s (budget {budget:.3f}s) {statement}"
+              + (f" - imported {', '.join(heavy)}" if heavy else ""))
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check_budgets() else 1)
@@ -0,0 +1,127 @@
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+from pandas import DataFrame, Series
+
+
+class AggregateStore:
+    """
+    Persistent store of per-file aggregates: the row count and the moral value totals (the result of the
+    `MoralDistributionFilter`) of every csv written by `occurrences_to_csv` or `DataLoader.save`. Category level charts
+    are built from it without reading the csvs again. Entries are keyed by the path of the csv and only served while
+    its modification time and size match, every file only updates its own entry. Backed by sqlite, so several
+    processes can write to the same store.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._connection = None
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """
+        creates a store if "aggregate_path" is set in the config.
+        :param config: config dictionary
+        :return: AggregateStore | None
+        """
+        path = config.get("aggregate_path")
+        if not path:
+            return None
+        return cls(path)
+
+    def get(self, path: str | Path) -> tuple[int, Series] | None:
+        """
+        get the aggregates of a csv if they are up to date.
+        :param path: path to the csv
+        :return: tuple of row count and moral value totals or None
+        """
+        key, mtime_ns, size = self._stat(path)
+        row = self._db().execute("SELECT mtime_ns, size, rows, totals FROM aggregates WHERE path = ?",
+                                 (key,)).fetchone()
+        if row is None or row[0] != mtime_ns or row[1] != size:
+            return None
+        return row[2], self._to_series(row[3])
+
+    def put(self, path: str | Path, rows: int, totals: Series) -> None:
+        """
+        stores the aggregates of a csv, replacing its old entry.
+        :param path: path to the (already written) csv
+        :param rows: number of rows of the csv
+        :param totals: moral value totals
+        :return: None
+        """
+        key, mtime_ns, size = self._stat(path)
+        # the order of the totals is kept
+        totals = json.dumps({str(label): value.item() if hasattr(value, "item") else value
+                             for label, value in totals.items()})
+        with self._db() as connection:
+            connection.execute("INSERT OR REPLACE INTO aggregates (path, mtime_ns, size, rows, totals) "
+                               "VALUES (?, ?, ?, ?, ?)", (key, mtime_ns, size, int(rows), totals))
+
+    def merge(self, other) -> None:
+        """
+        merges the entries of another store into this one, of two entries for the same file the newer one is kept.
+        :param other: AggregateStore
+        :return: None
+        """
+        entries = other._db().execute("SELECT path, mtime_ns, size, rows, totals FROM aggregates").fetchall()
+        with self._db() as connection:
+            for entry in entries:
+                current = connection.execute("SELECT mtime_ns FROM aggregates WHERE path = ?",
+                                             (entry[0],)).fetchone()
+                if current is None or current[0] < entry[1]:
+                    connection.execute("INSERT OR REPLACE INTO aggregates (path, mtime_ns, size, rows, totals) "
+                                       "VALUES (?, ?, ?, ?, ?)", entry)
+
+    def remove(self, path: str | Path) -> None:
+        """
+        removes the entry of a csv.
+        :param path: path to the csv
+        :return: None
+        """
+        with self._db() as connection:
+            connection.execute("DELETE FROM aggregates WHERE path = ?", (str(Path(path).resolve()),))
+
+    def info(self) -> DataFrame:
+        """
+        lists the entries of the store.
+        :return: DataFrame with the columns 'path', 'rows' and the moral value totals
+        """
+        entries = [{"path": path, "rows": rows, **json.loads(totals)}
+                   for path, rows, totals in self._db().execute("SELECT path, rows, totals FROM aggregates")]
+        return DataFrame(entries)
+
+    @staticmethod
+    def _stat(path: str | Path) -> tuple[str, int, int]:
+        stat = os.stat(path)
+        return str(Path(path).resolve()), stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def _to_series(totals: str) -> Series:
+        return pd.Series(json.loads(totals))
+
+    def _db(self) -> sqlite3.Connection:
+        """
+        Helper to open the sqlite store lazily, so every (worker) process gets its own connection.
+        :return: sqlite3.Connection
+        """
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=60)
+            # write ahead logging lets several processes read while one writes
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS aggregates (path TEXT PRIMARY KEY, mtime_ns INTEGER, "
+                                     "size INTEGER, rows INTEGER, totals TEXT)")
+        return self._connection
+
+    def __getstate__(self):
+        # connections can't be sent to other processes
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        return state
+
+    def __repr__(self):
+        return f"AggregateStore({self.path})"
@@ -1,22 +1,27 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Type, List
+from typing import Type, List, Iterator
 
 import numpy as np
 import pandas as pd
-import spacy
-import matplotlib as mpl
-
-from matplotlib import pyplot as plt
 from pandas import Series, DataFrame
 
+from data_analysis.aggregates import AggregateStore
+from data_analysis.counting import count_moral_values
+from data_analysis.cube import MoralCube
 from data_analysis.data_filter import DataFilter, MoralDistributionFilter
-from data_analysis.dataloader import FileDataLoader
+from data_analysis.dataloader import FileDataLoader, DirDataLoader, LOADER_VERSION
 from data_analysis.filter_sequence import FilterSequence
+from data_analysis.frame_cache import FrameCache
+from data_analysis.lemma_cache import LemmaCache, DEFAULT_MAXSIZE
+from data_analysis.manifest import RunManifest, MANIFEST_NAME
+from data_analysis.nlp_registry import ModelRegistry
 from data_analysis.plotter import Plotter
+from data_analysis.preprocessing import MORAL_ORDER, span_table
 
-MFT_SET = {"Care", "Harm", "Fairness", "Cheating", "Loyalty", "Betrayal", "Authority", "Subversion", "Purity",
-           "Degradation", "Liberty",
-           "Oppression", "OTHER"}
+# components of the pipelines lemmatization never uses
+LEMMA_DISABLE = ["parser", "ner", "senter"]
 
 
 class Analyzer:
@@ -26,116 +31,270 @@ class Analyzer:
 
     def __init__(self, dataloader: FileDataLoader, config: dict, skip_nlp: bool = False):
         self.plotter = Plotter(config)
-        self.data = dataloader.load()
+        self.dataloader = dataloader
+        # streaming mode: csv files are processed in chunks of this many rows
+        self.chunksize = config.get("chunksize") if isinstance(dataloader, FileDataLoader) else None
         self.config = config
         self.skip_nlp = skip_nlp
+        # data and spaCy model are only loaded once a method needs them, see the properties
+        self._data = None
+        self._nlp = None
+        # one lemma cache per model, keyed by model name and version
+        self.lemma_caches = {}
+        # result csvs are shared by all Analyzers of the process
+        self.frame_cache = FrameCache.shared(config.get("frame_cache_size"))
+        # row counts and moral value totals of the written csvs, if "aggregate_path" is set
+        self.aggregates = AggregateStore.from_config(config)
         path = Path(self.config['file_path'])
         if not skip_nlp:
             if path.is_dir():
                 self.mode = "dir"
-                self.files = iter([file for file in path.iterdir() if file.is_file()])
+                self.files = iter(DirDataLoader.list_files(path))
             else:
                 self.mode = "file"
-                self.nlp = self._nlp_factory(path.name)
 
-    def occurrences_to_csv(self, save: bool = False, aggregate: bool = False, **kwargs) -> DataFrame | List[DataFrame]:
+    @property
+    def data(self) -> DataFrame | List[DataFrame] | Iterator[tuple] | None:
+        """
+        the data of the dataloader, loaded on first access. In lazy mode (dirs only) an iterator of
+        (file name, DataFrame) pairs that only holds one file at a time and can only be iterated once. None in
+        streaming mode.
+        :return: DataFrame | list[DataFrame] | Iterator | None
+        """
+        if self._data is None and not self.chunksize:
+            if self.config.get("lazy") and isinstance(self.dataloader, DirDataLoader):
+                self._data = self.dataloader.iter_load()
+            else:
+                self._data = self.dataloader.load()
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
+
+    @property
+    def nlp(self):
+        """
+        the spaCy model of the file (file mode only), loaded on first access.
+        :return: spaCy Language or None
+        """
+        if self._nlp is None and not self.skip_nlp:
+            self._nlp = self._nlp_factory(Path(self.config['file_path']).name)
+        return self._nlp
+
+    @nlp.setter
+    def nlp(self, nlp):
+        self._nlp = nlp
+
+    def occurrences_to_csv(self, save: bool = False, aggregate: bool = False, n_workers: int = None,
+                           out_dir: str | Path = None, resume: bool = True,
+                           **kwargs) -> DataFrame | List[DataFrame] | List[Path]:
         """
         get, transform and turn data in to csv. either a single file or a whole directory.
         :param aggregate: whether the phrases should be aggregated if more then one
         :param save: whether to save the csv
+        :param n_workers: dir only: number of worker processes, defaults to the "n_workers" config value (1 = no
+        process pool). The files are grouped by language, so every worker only keeps one spaCy model loaded.
+        :param out_dir: dir only: write the csv of every file to `out_dir/<file name>_occurrences.csv` as soon as it
+        is ready and return the paths instead of holding all DataFrames in memory
+        :param resume: dir only, with out_dir: keep a run manifest ("manifest_path" in the config, defaults to
+        `out_dir/manifest.json`) and only process files that are new or changed since the last run
         :param kwargs: set phrase to index of df with index_col="phrase"
         :return: DataFrame (or Error :))
         """
         path = Path(self.config['file_path'])
-        if path.is_file():
-            data = self.data
+        if path.is_file() and self.chunksize:
+            df = self._stream_occurrences(aggregate, **kwargs)
+            if save:
+                df.to_csv(path, index=kwargs.get("index_col", False))
+                self._record_aggregates(path, df)
+            return df
+        elif path.is_file():
             # eval if phrases should be aggregated
-            if aggregate:
-                data_dict = self._map_aggr_data(data, 'phrase_to_moral', nlp=self.nlp)
-                counted_vals = self._count_aggr_moral_vals(data_dict)
-                df = self._make_csv(counted_vals, **kwargs)
-            else:
-                print("aggre False")
-                data_dict = self._map_data(data, 'phrase_to_moral', nlp=self.nlp)
-                print(type(data_dict), "\n", data_dict)
-                counted_vals = self._count_moral_vals(data_dict)
-                df = self._make_csv(counted_vals, **kwargs)
+            counted_vals = self._count_moral_vals(self.data, self.nlp, aggregate)
+            df = self._make_csv(counted_vals, **kwargs)
             if save:
                 df.to_csv(path, index=kwargs.get("index_col", False))
+                self._record_aggregates(path, df)
             return df
         else:
-            data_stack = []
-            for data in self.data:
-                current_file = next(self.files).name
-                nlp = self._nlp_factory(current_file)
-                # eval if phrases should be aggregated
-                if aggregate:
-                    print(f"nlping {current_file}")
-                    data_dict = self._map_aggr_data(data, 'phrase_to_moral', nlp, current_file=current_file)
-                    print("done!")
-                    counted_vals = self._count_aggr_moral_vals(data_dict)
-                else:
-                    data_dict = self._map_data(data, 'phrase_to_moral', nlp, current_file=current_file)
-
-                    counted_vals = self._count_moral_vals(data_dict)
-                df = self._make_csv(counted_vals, **kwargs)
-                data_stack.append(df)
+            n_workers = n_workers or self.config.get("n_workers", 1)
+            manifest = None
+            if out_dir is not None:
+                Path(out_dir).mkdir(parents=True, exist_ok=True)
+                if resume:
+                    manifest = RunManifest(self.config.get("manifest_path") or Path(out_dir) / MANIFEST_NAME)
+            items = self._dir_items()
+            data_stack = [None] * len(items)
+            keys = {}
+            todo = []
+            for position, (file_name, _) in enumerate(items):
+                if manifest is not None:
+                    keys[file_name] = self._run_key(path / file_name, aggregate, **kwargs)
+                    output = manifest.output(file_name, keys[file_name])
+                    if output is not None:
+                        print(f"skipping unchanged file: {file_name}")
+                        data_stack[position] = output
+                        continue
+                todo.append(position)
+            if n_workers > 1:
+                results = self._parallel_occurrences([items[position] for position in todo], n_workers, aggregate,
+                                                     out_dir, **kwargs)
+            else:
+                results = ((i, self._file_occurrences(*items[position], aggregate, out_dir, **kwargs))
+                           for i, position in enumerate(todo))
+            for i, result in results:
+                position = todo[i]
+                data_stack[position] = result
+                if manifest is not None:
+                    # recorded right away, so a killed run resumes after the last finished file
+                    file_name = items[position][0]
+                    manifest.record(file_name, keys[file_name], result, model=ModelRegistry.model_name(file_name))
             return data_stack
 
-    def _count_aggr_moral_vals(self, data_dict: dict) -> list[dict[str:str | str:int]]:
-        """
-        Helper method to count moral values for each phrase
-        :param data_dict: dictionary containing phrases mapping to lists of all the moral values that they were labeled with.
-        :return: list of format [{"phrase": phrase | moral_value: count}
-        """
-        # count moral values in data dict
-        list_of_phrases = []
-        for phrase, moral_val_list in data_dict.items():
-            moral_val_counter = {mv: 0 for mv in MFT_SET}
-            # iter over moral_val strings
-            for occurrence in moral_val_list:
-                # iter over list of moral values and count them
-                if occurrence in MFT_SET:
-                    moral_val_counter[occurrence] += 1
-            moral_val_counter["phrase"] = phrase
-            # append dict to list
-            list_of_phrases.append(moral_val_counter)
-        return list_of_phrases
-
-    def _count_moral_vals(self, data_list: list) -> list[dict[str:str | str:int]]:
-        """
-        Helper method to count non aggregated moral values for each phrase
-        :param data_list: dictionary containing phrases mapping to lists of all the moral values that they were labeled with.
-        :return: list of format [{"phrase": phrase | moral_value: count}
-        """
-        # count moral values in data dict
-        list_of_phrases = []
-        for data_dict in data_list:
-            for phrase, moral_val_list in data_dict.items():
-                moral_val_counter = {mv: 0 for mv in MFT_SET}
-                # iter over moral_val strings
-                for occurrence in moral_val_list:
-                    # iter over list of moral values and count them
-                    if occurrence in MFT_SET:
-                        moral_val_counter[occurrence] += 1
-                moral_val_counter["phrase"] = phrase
-                # append dict to list
-                list_of_phrases.append(moral_val_counter)
-        return list_of_phrases
-
-    def _make_csv(self, counted_vals: list, save: bool = False, out_path: str = "data/output/test.csv",
+    def _dir_items(self) -> List[tuple]:
+        """
+        Helper to get the files of a dir to count. In lazy mode only the paths are listed, the files are loaded when
+        they are counted (and not at all if they are skipped).
+        :return: list of (file name, DataFrame or Path) pairs, in the order of the files
+        """
+        if isinstance(self.data, list):
+            return list(self._iter_files())
+        return [(file.name, file) for file in DirDataLoader.list_files(self.config['file_path'])]
+
+    def _run_key(self, file: Path, aggregate: bool, **kwargs) -> str:
+        """
+        Helper to build the run manifest key of a file: its content, the config, the spaCy model and the settings.
+        :param file: Path of the input file
+        :param aggregate: whether the phrases are aggregated
+        :param kwargs: passed on to `_make_csv`
+        :return: str
+        """
+        model_name = ModelRegistry.model_name(file.name)
+        return RunManifest.make_key(file, self.config, LOADER_VERSION, model=model_name,
+                                    model_version=ModelRegistry.model_version(model_name), skip_nlp=self.skip_nlp,
+                                    aggregate=aggregate, kwargs=kwargs)
+
+    def _file_occurrences(self, file_name: str, data: DataFrame | Path, aggregate: bool, out_dir: str | Path = None,
+                          **kwargs) -> DataFrame | Path:
+        """
+        Helper to count the occurrences of a single file of a dir.
+        :param file_name: name of the file, its language prefix picks the spaCy model
+        :param data: processed DataFrame or the Path of the file to load it from
+        :param aggregate: whether the phrases should be aggregated if more then one
+        :param out_dir: dir to write the csv to, the DataFrame is returned if None
+        :param kwargs: passed on to `_make_csv`
+        :return: DataFrame or Path of the written csv
+        """
+        if isinstance(data, Path):
+            data = self.dataloader._load_file(data)
+        nlp = self._nlp_factory(file_name)
+        print(f"nlping {file_name}")
+        # eval if phrases should be aggregated
+        counted_vals = self._count_moral_vals(data, nlp, aggregate)
+        print("done!")
+        df = self._make_csv(counted_vals, **kwargs)
+        if out_dir is None:
+            return df
+        out_path = Path(out_dir) / f"{Path(file_name).stem}_occurrences.csv"
+        df.to_csv(out_path, index=bool(kwargs.get("index_col", False)))
+        self._record_aggregates(out_path, df)
+        return out_path
+
+    def _record_aggregates(self, path: str | Path, df: DataFrame) -> None:
+        """
+        Helper to record the row count and moral value totals of a written csv in the aggregate store.
+        :param path: path of the csv
+        :param df: DataFrame that was written
+        :return: None
+        """
+        if self.aggregates is None:
+            return
+        if "phrase" not in df.columns:
+            # phrases were set as index
+            df = df.reset_index()
+        self.aggregates.put(path, len(df), MoralDistributionFilter(df).filter())
+
+    def _parallel_occurrences(self, items: List[tuple], n_workers: int, aggregate: bool, out_dir: str | Path = None,
+                              **kwargs) -> Iterator[tuple]:
+        """
+        Helper to count the occurrences of the files of a dir in a process pool. The files are grouped by their
+        language and every group gets its own pool, so each worker keeps exactly one spaCy model warm and the models
+        are freed before the next language.
+        :param items: list of (file name, DataFrame or Path) pairs
+        :param n_workers: max number of worker processes
+        :param aggregate: whether the phrases should be aggregated if more then one
+        :param out_dir: dir to write the csvs to, the DataFrames are returned if None
+        :param kwargs: passed on to `_make_csv`
+        :return: Iterator of (position in items, DataFrame or Path) pairs, as soon as a file is done
+        """
+        groups = {}
+        for position, (file_name, data) in enumerate(items):
+            groups.setdefault(ModelRegistry.model_name(file_name), []).append((position, file_name, data))
+        worker = partial(_occurrences_worker, self.config, self.skip_nlp, aggregate, out_dir, kwargs)
+        for model_name, group in groups.items():
+            print(f"nlping {len(group)} files with {model_name} on {min(n_workers, len(group))} workers")
+            with ProcessPoolExecutor(max_workers=min(n_workers, len(group))) as executor:
+                # map keeps the order of the files
+                counted = executor.map(worker, [(file_name, data) for _, file_name, data in group])
+                for (position, _, _), result in zip(group, counted):
+                    yield position, result
+
+    def _stream_occurrences(self, aggregate: bool, **kwargs) -> DataFrame:
+        """
+        Streaming counterpart to the file branch of `occurrences_to_csv`: lemmatizes and counts the data chunk by
+        chunk and folds the partial counts together. Gives the same DataFrame as the in-memory path.
+        :param aggregate: whether the phrases should be aggregated if more then one
+        :param kwargs: passed on to `_make_csv`
+        :return: DataFrame
+        """
+        parts = []
+        for chunk in self.dataloader.iter_chunks(self.chunksize):
+            part = self._count_moral_vals(chunk, self.nlp, aggregate)
+            if aggregate and parts:
+                # phrases that occur in several chunks are summed up, the order of first occurrence is kept
+                part = pd.concat([parts.pop(), part], ignore_index=True)
+                part = part.groupby('phrase', sort=False, dropna=False).sum().reset_index()
+            parts.append(part)
+        return self._make_csv(pd.concat(parts, ignore_index=True), **kwargs)
+
+    def _iter_files(self):
+        """
+        Helper that pairs every DataFrame of a dir with the name of its file.
+        :return: Iterator of (file name, DataFrame) pairs
+        """
+        if isinstance(self.data, list):
+            for data in self.data:
+                yield next(self.files).name, data
+        else:
+            # lazy loader already yields the pairs
+            yield from self.data
+
+    def _count_moral_vals(self, data: DataFrame, nlp, aggregate: bool) -> DataFrame:
+        """
+        Helper method to count the moral values for each (lemmatized) phrase.
+        :param data: processed DataFrame or span table
+        :param nlp: spaCy Language used to lemmatize the phrases
+        :param aggregate: whether phrases are counted across rows or every instance on its own
+        :return: DataFrame of format phrase | moral_value counts
+        """
+        spans = span_table(data)
+        phrases = self._map_keys(spans, nlp)
+        row_ids = None if aggregate else spans["row_id"]
+        return count_moral_values(phrases, spans["moral"], row_ids)
+
+    def _make_csv(self, counted_vals: DataFrame, save: bool = False, out_path: str = "data/output/test.csv",
                   index_col: str | bool = False) -> DataFrame:
         """
-        Helper method that takes a dict mapping phrases to labeled moral values and creates a Dataframe with the phrases
+        Helper method that takes the counted moral values of the phrases and creates a Dataframe with the phrases
          and the respective number they were labeled.
-        :param counted_vals: list
+        :param counted_vals: DataFrame
         :param save: bool
         :param index_col: str|bool
         :return: DataFrame
         """
         # create and order Dataframe
-        order = ['phrase', 'Care', 'Harm', 'Authority', 'Subversion', 'Fairness', 'Cheating', 'Purity', 'Degradation',
-                 'Loyalty', 'Betrayal', 'Liberty', 'Oppression', 'OTHER']
+        order = ['phrase'] + MORAL_ORDER
         df = DataFrame(counted_vals)
         df.fillna(0)
         df = df[order]
@@ -148,118 +307,77 @@ class Analyzer:
         # save if save true
         if save:
             df.to_csv(out_path, index=index)
+            self._record_aggregates(out_path, df)
         return df
 
-    def _map_aggr_data(self, data: DataFrame, mode: str, nlp, **kwargs) -> dict[str: list]:
+    def _map_keys(self, spans: DataFrame, nlp) -> Series:
         """
-        Helper method to process data DataFrame into a dictionary.
-        :param mode: str; options:
-        - 'phrase_to_moral': Target format: {word/phrase: [moral, values]}
-        - 'moral_to_phrase': Target format: {moral value: [word/phrase]}
-        :return: dict
+        Helper to get the (lemmatized) phrases of the span table, every unique phrase is only lemmatized once.
+        :param spans: span table
+        :param nlp: spaCy Language
+        :return: Series of lemmatized phrases aligned to spans
         """
-
-        data = data["moral_werte"]
-        # index factory or error based on mode
-        if mode == "phrase_to_moral":
-            key_index, val_index = 1, 0
-        elif mode == "moral_to_phrase":
-            key_index, val_index = 0, 1
-        else:
-            raise ValueError(f"Unknown mode: '{mode}'. consider using either 'phrase_to_moral' or 'moral_to_phrase'")
-        # init dict
-        data_dict = {}
-        # iter over list in Series
-        for s_list in data:
-            # iter over string in list
-            for idx, string in enumerate(s_list):
-                # check if string was split on unsafe semicolon:
-                if not any([string.startswith(moral_val) for moral_val in MFT_SET]):
-                    print("warning - propably split on wrong semicolon:\n" + s_list[idx - 1], string)
-                # slice string for key and val (based on mode)
-                sliced_str = string.split(":", maxsplit=1)
-                key = sliced_str[key_index].strip()
-                # lemmatize with stopword:
-                if mode == "phrase_to_moral":
-                    key = self._lemmatize(key, nlp, **kwargs)
-                val = sliced_str[val_index].strip()
-
-                # append data
-                if key in data_dict:
-                    data_dict[key].append(val)
-                else:
-                    data_dict[key] = [val]
-
-        return data_dict
-
-    def _map_data(self, data: DataFrame, mode: str, nlp, **kwargs) -> list[dict[str:list]]:
-        """
-        Helper method to process data DataFrame into a list of dictionaries (non-aggregated).
-        Each dictionary represents a single phrase instance with its associated moral values.
-        :param mode: str; options:
-        - 'phrase_to_moral': Target format: {word/phrase: [moral, values]}
-        - 'moral_to_phrase': Target format: {moral value: [word/phrase]}
-        :return: list of dict
-        """
-        data = data["moral_werte"]
-        # Initialize an empty list to store dictionaries
-        data_list = []
-        # index factory or error based on mode
-        if mode == "phrase_to_moral":
-            key_index, val_index = 1, 0
-        elif mode == "moral_to_phrase":
-            key_index, val_index = 0, 1
-        else:
-            raise ValueError(f"Unknown mode: '{mode}'. consider using either 'phrase_to_moral' or 'moral_to_phrase'")
-        # iter over list in Series
-        for s_list in data:
-            # Initialize a dictionary for each phrase instance
-            phrase_dict = {}
-            # iter over string in list
-            for idx, string in enumerate(s_list):
-                # check if string was split on unsafe semicolon:
-                if not any([string.startswith(moral_val) for moral_val in MFT_SET]):
-                    print("warning - propably split on wrong semicolon:", s_list[idx - 1], string)
-                # slice string for key and val (based on mode)
-                sliced_str = string.split(":", maxsplit=1)
-                key = sliced_str[key_index].strip()
-                # lemmatize with stopword:
-                if mode == "phrase_to_moral":
-                    key = self._lemmatize(key, nlp, **kwargs)
-                val = sliced_str[val_index].strip()
-                # Add the moral value to the phrase dictionary
-                if key in phrase_dict.keys():
-                    phrase_dict[key].append(val)
-                else:
-                    phrase_dict[key] = [val]
-            # Append the phrase dictionary to the list
-            data_list.append(phrase_dict)
-        print(data_list)
-        return data_list
+        lemmas = self._lemmatize_all(spans["phrase"].unique(), nlp)
+        return spans["phrase"].map(lemmas)
 
     def _nlp_factory(self, path: str):
-        in_path = path
-        if in_path.startswith("DE"):
-            nlp = spacy.load('de_core_news_lg')
-            return nlp
-        elif in_path.startswith("EN"):
-            nlp = spacy.load('en_core_web_lg')
-            return nlp
-        elif in_path.startswith("FR"):
-            nlp = spacy.load('fr_core_news_lg')
-            return nlp
-        elif in_path.startswith("IT"):
-            nlp = spacy.load('it_core_news_lg')
-            return nlp
-        else:
-            print("unsupported language or file name. Supported language prefixes are: EN, DE, FR, IT")
-            return None
+        """
+        get the spaCy model for a file by its language prefix. Models come from the process wide registry, so each
+        one is only loaded once.
+        :param path: name of the file
+        :return: spaCy Language or None for unsupported languages
+        """
+        return ModelRegistry.for_file(path)
+
+    def _lemmatize_all(self, strings, nlp) -> dict:
+        """
+        lemmatizes many strings at once. Strings missing in the lemma cache are run through `nlp.pipe` in batches of
+        "nlp_batch_size" (on "nlp_n_process" processes) with only the components lemmatization needs.
+        :param strings: iterable of unique strings
+        :param nlp: spaCy Language
+        :return: dict mapping every string to its lemmatized string
+        """
+        if self.skip_nlp:
+            return {string: None for string in strings}
+        cache = self._lemma_cache(nlp)
+        lemmas = {}
+        missing = []
+        for string in strings:
+            lemmatized_string = cache.get(string)
+            if lemmatized_string is None:
+                missing.append(string)
+            else:
+                lemmas[string] = lemmatized_string
+        if missing:
+            disable = [name for name in LEMMA_DISABLE if name in nlp.pipe_names]
+            docs = nlp.pipe(missing, batch_size=self.config.get("nlp_batch_size", 256), disable=disable,
+                            n_process=self.config.get("nlp_n_process", 1))
+            for string, doc in zip(missing, docs):
+                lemmatized_string = ' '.join([token.lemma_ for token in doc])
+                lemmas[string] = lemmatized_string
+                cache.put(string, lemmatized_string)
+            cache.flush()
+        return lemmas
 
-    def _lemmatize(self, string: str, nlp, **kwargs):
-        if not self.skip_nlp:
-            doc = nlp(string)
-            lemmatized_string = ' '.join([token.lemma_ for token in doc])
-            return lemmatized_string
+    def _lemma_cache(self, nlp) -> LemmaCache:
+        """
+        Helper to get the lemma cache of a model. The caches persist to "lemma_cache_path" if set in the config and
+        hold "lemma_cache_size" lemmas in memory.
+        :param nlp: spaCy Language
+        :return: LemmaCache
+        """
+        model_id = LemmaCache.model_id(nlp)
+        if model_id not in self.lemma_caches:
+            self.lemma_caches[model_id] = LemmaCache(*model_id, self.config.get("lemma_cache_path"),
+                                                     self.config.get("lemma_cache_size", DEFAULT_MAXSIZE))
+        return self.lemma_caches[model_id]
+
+    def lemma_cache_stats(self) -> DataFrame:
+        """
+        hit and miss counts of the lemma caches, one row per model.
+        :return: DataFrame
+        """
+        return DataFrame([cache.stats() for cache in self.lemma_caches.values()])
 
     def make_piechart(self, data: DataFrame, c_map: str = 'tab20b', save: bool = True) -> None:
         """
@@ -286,29 +404,89 @@ class Analyzer:
 
     def make_bar_chart(self, data_dict: dict, save_path: str = None,
                        normalize: bool = True, inverted:bool=False, divide_by_anno: bool=True):  # , data_filter: Type[DataFilter | FilterSequence]
+        """
+        Method to make a bar chart of the moral value distribution by category. The row counts and moral value totals
+        of the csvs come from the aggregate store if they are recorded there, otherwise from the shared frame cache, so
+        repeated calls on the same files don't read them again.
+        :param data_dict: dictionary mapping a category (eg. 'Leserbriefe' or 'POS') to the paths of the csvs
+        :param save_path: str path where the figure should be saved to. if None, the figure will be shown instead of saved.
+        :param normalize: bool whether the data should be normalized
+        :param inverted: bool whether the bars should represent the categories
+        :param divide_by_anno: bool whether to normalize by the number of annotated moral values of a category
+        instead of its length
+        :return: None
+        """
         # prepare data normalization
         prepared_data = {}
-        lens = []
         total_data_len = 0
         for category in data_dict:
             category_len = 0
-            category_data = []
+            category_totals = []
             for path in data_dict[category]:
-                data = pd.read_csv(path)
-                data_len = len(data)
-                category_len += data_len
-                category_data.append(data)
+                rows, totals = self._file_aggregates(path)
+                category_len += rows
+                category_totals.append(totals)
             total_data_len += category_len
-            prepared_data[category] = (category_len, category_data)
+            prepared_data[category] = (category_len, category_totals)
 
         for prep_cat in prepared_data:
             prep_len = prepared_data[prep_cat][0]   # cat_len
-            prep_data = pd.concat(prepared_data[prep_cat][1])
-            f = MoralDistributionFilter(prep_data)
-            prep_data = f.filter()
+            # the totals of a category are the sums of the totals of its csvs
+            prep_data = pd.concat(prepared_data[prep_cat][1], axis=1).sum(axis=1)
             prep_norm = prep_len / total_data_len
             prepared_data[prep_cat] = (prep_len, prep_norm, prep_data)
         if inverted:
-            self.plotter.make_inverted_bar_chart(data_dict=prepared_data, save_path=save_path, normalize=normalize)
+            self.plotter.make_inverted_bar_chart(data_dict=prepared_data, save_path=save_path, normalize=normalize,
+                                                 divide_by_anno=divide_by_anno)
         else:
-            self.plotter.make_bar_chart(data_dict=prepared_data, save_path=save_path, normalize=normalize)
\ No newline at end of file
+            self.plotter.make_bar_chart(data_dict=prepared_data, save_path=save_path, normalize=normalize,
+                                        divide_by_anno=divide_by_anno)
+
+    def moral_cube(self, data_dict: dict) -> MoralCube:
+        """
+        Method to build the phrase x category x moral value cube of all categories, eg. to compare the moral profile
+        of a phrase across categories. The csvs are read through the shared frame cache.
+        :param data_dict: dictionary mapping a category (eg. 'Leserbriefe' or 'POS') to the paths of the csvs
+        :return: MoralCube
+        """
+        return MoralCube.from_data_dict(data_dict, frame_cache=self.frame_cache)
+
+    def _file_aggregates(self, path: str | Path) -> tuple[int, Series]:
+        """
+        Helper to get the row count and moral value totals of a csv, recorded in the aggregate store if there is one.
+        :param path: path of the csv
+        :return: tuple of row count and moral value totals
+        """
+        if self.aggregates is not None:
+            aggregates = self.aggregates.get(path)
+            if aggregates is not None:
+                return aggregates
+        rows, totals = self.frame_cache.summary(path)
+        if self.aggregates is not None:
+            self.aggregates.put(path, rows, totals)
+        return rows, totals
+
+
+# analyzer of a worker process, kept between tasks so its lemma caches stay warm
+_worker_analyzer = None
+
+
+def _occurrences_worker(config: dict, skip_nlp: bool, aggregate: bool, out_dir: str | Path, kwargs: dict,
+                        item: tuple) -> DataFrame | Path:
+    """
+    counts the occurrences of a single file of a dir in a worker process. Only the config is sent to the worker, not
+    the Analyzer with all its data. spaCy models come from the registry of the worker process.
+    :param config: config dictionary
+    :param skip_nlp: whether to skip lemmatization
+    :param aggregate: whether the phrases should be aggregated if more then one
+    :param out_dir: dir to write the csv to, the DataFrame is returned if None
+    :param kwargs: passed on to `_make_csv`
+    :param item: tuple of file name and processed DataFrame or Path of the file
+    :return: DataFrame or Path of the written csv
+    """
+    global _worker_analyzer
+    if _worker_analyzer is None:
+        # the data is passed with every task (or loaded by the worker), the analyzer itself doesn't load anything
+        _worker_analyzer = Analyzer(DirDataLoader(config), config, skip_nlp)
+    file_name, data = item
+    return _worker_analyzer._file_occurrences(file_name, data, aggregate, out_dir, **kwargs)
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+from pandas import DataFrame
+
+DEFAULT_MAX_SIZE = 1024 ** 3  # 1 GiB
+CACHE_SUFFIX = ".pkl"
+
+
+class ProcessedDataCache:
+    """
+    Content addressed on-disk cache for preprocessed DataFrames. Entries are keyed by the hash of the source file's
+    content, the preprocessing config and the loader version, so a changed file or config never hits a stale entry.
+    The least recently used entries are evicted once the cache grows beyond `max_size` bytes.
+    """
+
+    def __init__(self, cache_dir: str | Path, max_size: int = DEFAULT_MAX_SIZE):
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """
+        creates a cache if "cache_dir" is set in the config, optionally limited by "cache_max_size" (bytes).
+        :param config: config dictionary
+        :return: ProcessedDataCache | None
+        """
+        cache_dir = config.get("cache_dir")
+        if not cache_dir:
+            return None
+        return cls(cache_dir, config.get("cache_max_size", DEFAULT_MAX_SIZE))
+
+    @staticmethod
+    def make_key(path: str | Path, config: dict, version: str) -> str:
+        """
+        builds the cache key from the file content, the preprocessing relevant config and the loader version.
+        :param path: path to the source file
+        :param config: config dictionary
+        :param version: version of the loader that processed the data
+        :return: str hex digest
+        """
+        content_hash = hashlib.sha256()
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(1024 * 1024), b""):
+                content_hash.update(block)
+        settings = json.dumps({"drop_cols": config.get("drop_cols"), "merge_cols": config.get("merge_cols"),
+                               "id_cols": config.get("id_cols"), "dtypes": config.get("dtypes"),
+                               "long_form": bool(config.get("long_form")), "version": version},
+                              sort_keys=True, default=str)
+        return hashlib.sha256((content_hash.hexdigest() + settings).encode()).hexdigest()
+
+    def get(self, key: str) -> DataFrame | None:
+        """
+        load an entry from the cache.
+        :param key: cache key
+        :return: DataFrame or None on a miss
+        """
+        entry = self._entry_path(key)
+        try:
+            data = pd.read_pickle(entry)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        # mark as recently used
+        try:
+            os.utime(entry)
+        except FileNotFoundError:
+            # evicted by another process in the meantime
+            pass
+        return data
+
+    def put(self, key: str, data: DataFrame) -> None:
+        """
+        store an entry in the cache and evict old entries if the size limit is exceeded.
+        :param key: cache key
+        :param data: DataFrame
+        :return: None
+        """
+        # write to a temp file first, so concurrent readers never see half written entries
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        os.close(fd)
+        try:
+            data.to_pickle(tmp_path)
+            os.replace(tmp_path, self._entry_path(key))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._evict()
+
+    def info(self) -> DataFrame:
+        """
+        lists the cache entries, most recently used first.
+        :return: DataFrame with the columns 'key', 'size' and 'last_used'
+        """
+        entries = [{"key": entry.stem, "size": stat.st_size, "last_used": pd.Timestamp(stat.st_mtime, unit="s")}
+                   for entry, stat in self._entries()]
+        info = DataFrame(entries, columns=["key", "size", "last_used"])
+        return info.sort_values("last_used", ascending=False, ignore_index=True)
+
+    def size(self) -> int:
+        """
+        :return: total size of the cache in bytes
+        """
+        return sum(stat.st_size for _, stat in self._entries())
+
+    def clear(self) -> None:
+        """
+        removes all entries from the cache.
+        :return: None
+        """
+        for entry, _ in self._entries():
+            entry.unlink(missing_ok=True)
+
+    def _evict(self) -> None:
+        """
+        removes the least recently used entries until the cache fits into max_size.
+        :return: None
+        """
+        entries = sorted(self._entries(), key=lambda item: item[1].st_mtime)
+        total = sum(stat.st_size for _, stat in entries)
+        for entry, stat in entries:
+            if total <= self.max_size:
+                break
+            entry.unlink(missing_ok=True)
+            total -= stat.st_size
+
+    def _entries(self) -> list:
+        entries = []
+        for entry in self.cache_dir.glob("*" + CACHE_SUFFIX):
+            try:
+                entries.append((entry, entry.stat()))
+            except FileNotFoundError:
+                # removed by another process in the meantime
+                continue
+        return entries
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / (key + CACHE_SUFFIX)
+
+    def __repr__(self):
+        return f"ProcessedDataCache({self.cache_dir}, {len(self._entries())} entries, {self.size()} bytes)"
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+from pandas import DataFrame, Series
+
+from data_analysis.preprocessing import MORAL_ORDER, MORAL_DTYPE
+
+
+def count_moral_values(phrases: Series, morals: Series, row_ids: Series = None) -> DataFrame:
+    """
+    counts the moral values of (phrase, moral value) pairs with integer codes and a single bincount.
+    Aggregated (row_ids is None): one row per phrase. Non-aggregated: one row per phrase and source row, ie. every
+    instance of a phrase is counted on its own. Rows come in the order the phrases first occur.
+    :param phrases: Series of (lemmatized) phrases
+    :param morals: Series of moral values aligned to phrases, values outside of MORAL_ORDER are not counted
+    :param row_ids: Series of the source row ids aligned to phrases, None to aggregate
+    :return: DataFrame with the columns 'phrase' and the moral values in MORAL_ORDER
+    """
+    phrase_col, counts = count_codes(phrases, morals, row_ids)
+    df = DataFrame(counts, columns=MORAL_ORDER)
+    df.insert(0, "phrase", phrase_col)
+    return df
+
+
+def count_codes(phrases: Series, morals: Series, row_ids: Series = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Helper doing the counting of `count_moral_values`.
+    :param phrases: Series of (lemmatized) phrases
+    :param morals: Series of moral values aligned to phrases
+    :param row_ids: Series of the source row ids aligned to phrases, None to aggregate
+    :return: tuple of the phrase of every result row and the count matrix (result rows x MORAL_ORDER)
+    """
+    if row_ids is None:
+        codes, uniques = pd.factorize(phrases, use_na_sentinel=False)
+        phrase_col = np.asarray(uniques, dtype=object)
+    else:
+        pairs = DataFrame({"row_id": row_ids.to_numpy(), "phrase": phrases.to_numpy()})
+        codes = pairs.groupby(["row_id", "phrase"], sort=False, dropna=False).ngroup().to_numpy()
+        # the phrase of every pair, in order of the pair codes
+        first = np.unique(codes, return_index=True)[1]
+        phrase_col = pairs["phrase"].to_numpy()[first]
+    n_phrases = len(phrase_col)
+    n_morals = len(MORAL_ORDER)
+    moral_codes = pd.Categorical(morals, dtype=MORAL_DTYPE).codes
+    counted = moral_codes >= 0
+    counts = np.bincount(codes[counted] * n_morals + moral_codes[counted], minlength=n_phrases * n_morals)
+    return phrase_col, counts.reshape(n_phrases, n_morals).astype(np.int64)
@@ -0,0 +1,177 @@
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame, Series
+
+from data_analysis.matrix import PhraseMoralMatrix
+from data_analysis.preprocessing import MORAL_ORDER, moral_position
+
+
+class MoralCube:
+    """
+    Phrase x category x moral value count cube, eg. to compare the moral profile of a phrase across the categories of
+    a `data_dict` (Gerichtsurteile, Interviews, Kommentare, ...). Built incrementally from PhraseMoralMatrices or csvs
+    and saved as compressed npz. Lookups index the numpy cube directly, the ranking of a slice is computed on first use.
+    """
+
+    def __init__(self, phrases: List[str] = None, categories: List[str] = None, counts: np.ndarray = None):
+        """
+        :param phrases: list of the phrases (first axis)
+        :param categories: list of the categories (second axis)
+        :param counts: int array of shape (phrases, categories, len(MORAL_ORDER))
+        """
+        self.phrases = list(phrases or [])
+        self.categories = list(categories or [])
+        if counts is None:
+            counts = np.zeros((len(self.phrases), len(self.categories), len(MORAL_ORDER)), dtype=np.int64)
+        if counts.shape != (len(self.phrases), len(self.categories), len(MORAL_ORDER)):
+            raise ValueError(f"counts must be of shape ({len(self.phrases)}, {len(self.categories)}, "
+                             f"{len(MORAL_ORDER)}), got: {counts.shape}")
+        self.counts = counts
+        self._phrase_codes = {phrase: code for code, phrase in enumerate(self.phrases)}
+        self._category_codes = {category: code for code, category in enumerate(self.categories)}
+        self._rankings = {}
+
+    @classmethod
+    def from_data_dict(cls, data_dict: dict, frame_cache=None):
+        """
+        builds the cube of all categories of a data_dict.
+        :param data_dict: dictionary mapping a category (eg. 'Leserbriefe' or 'POS') to the paths of the csvs
+        :param frame_cache: optional FrameCache to read the csvs through
+        :return: MoralCube
+        """
+        cube = cls()
+        for category, paths in data_dict.items():
+            cube.add_csvs(category, paths, frame_cache)
+        return cube
+
+    @classmethod
+    def load(cls, path: str | Path):
+        """
+        :param path: path to a cube saved with `save()`
+        :return: MoralCube
+        """
+        with np.load(path) as cube:
+            return cls(cube["phrases"].tolist(), cube["categories"].tolist(), cube["counts"].astype(np.int64))
+
+    def save(self, path: str | Path) -> None:
+        """
+        saves the cube as compressed npz, the counts in the smallest fitting integer type.
+        :param path: path of the file
+        :return: None
+        """
+        max_count = int(self.counts.max()) if self.counts.size else 0
+        dtype = np.min_scalar_type(max_count)
+        np.savez_compressed(path, phrases=np.asarray(self.phrases, dtype=str),
+                            categories=np.asarray(self.categories, dtype=str), counts=self.counts.astype(dtype))
+
+    def add_csvs(self, category: str, paths: List[str | Path], frame_cache=None) -> None:
+        """
+        adds the counts of csvs (as written by `occurrences_to_csv`) to a category.
+        :param category: str
+        :param paths: list of paths to the csvs
+        :param frame_cache: optional FrameCache to read the csvs through
+        :return: None
+        """
+        matrices = [PhraseMoralMatrix.from_frame(frame_cache.frame(path)) if frame_cache is not None
+                    else PhraseMoralMatrix.from_csv(path) for path in paths]
+        self.add(category, PhraseMoralMatrix.concat(matrices))
+
+    def add(self, category: str, matrix: PhraseMoralMatrix) -> None:
+        """
+        adds the counts of a PhraseMoralMatrix to a category, new phrases and categories are appended.
+        :param category: str
+        :param matrix: PhraseMoralMatrix
+        :return: None
+        """
+        # missing phrases (NaN) are left out, like in a groupby
+        missing = pd.isna(matrix.vocabulary)[matrix.codes]
+        if missing.any():
+            matrix = PhraseMoralMatrix(matrix.vocabulary, matrix.codes[~missing], matrix.counts[~missing])
+        matrix = matrix.aggregate()
+        phrases = [str(phrase) for phrase in matrix.phrases]
+        new_phrases = list(dict.fromkeys(phrase for phrase in phrases if phrase not in self._phrase_codes))
+        new_category = category not in self._category_codes
+        if new_phrases or new_category:
+            self.counts = np.pad(self.counts, ((0, len(new_phrases)), (0, int(new_category)), (0, 0)))
+            for phrase in new_phrases:
+                self._phrase_codes[phrase] = len(self.phrases)
+                self.phrases.append(phrase)
+            if new_category:
+                self._category_codes[category] = len(self.categories)
+                self.categories.append(category)
+        codes = np.fromiter((self._phrase_codes[phrase] for phrase in phrases), dtype=np.int64, count=len(phrases))
+        np.add.at(self.counts[:, self._category_codes[category]], codes, matrix.counts)
+        self._rankings = {}
+
+    def profile(self, phrase: str) -> np.ndarray:
+        """
+        the raw counts of a phrase, without building a DataFrame.
+        :param phrase: str
+        :return: array of shape (categories, moral values)
+        """
+        return self.counts[self._phrase_codes[phrase]]
+
+    def phrase_by_category(self, phrase: str) -> DataFrame:
+        """
+        the distribution of a phrase by category.
+        :param phrase: str
+        :return: DataFrame with the categories as index and the moral values as columns
+        """
+        return DataFrame(self.profile(phrase), index=self.categories, columns=MORAL_ORDER)
+
+    def top_phrases(self, moral: str, category: str = None, k: int = 10) -> Series:
+        """
+        the phrases most often labeled with a moral value, in a category or across all categories.
+        :param moral: moral value
+        :param category: str, all categories if None
+        :param k: number of phrases
+        :return: Series of counts indexed by phrase, descending
+        """
+        values, ranking = self._ranking(moral, category)
+        top = ranking[:k]
+        return Series(values[top], index=[self.phrases[code] for code in top], name=moral)
+
+    def category_totals(self) -> DataFrame:
+        """
+        :return: DataFrame of the moral value totals with the categories as index
+        """
+        return DataFrame(self.counts.sum(axis=0), index=self.categories, columns=MORAL_ORDER)
+
+    def slice(self, phrases: List[str] = None, categories: List[str] = None, morals: List[str] = None) -> np.ndarray:
+        """
+        slices the raw cube, every axis is kept completely if None.
+        :param phrases: list of phrases
+        :param categories: list of categories
+        :param morals: list of moral values
+        :return: array of shape (phrases, categories, moral values)
+        """
+        phrase_codes = slice(None) if phrases is None else [self._phrase_codes[phrase] for phrase in phrases]
+        category_codes = slice(None) if categories is None else [self._category_codes[c] for c in categories]
+        moral_codes = slice(None) if morals is None else [moral_position(moral) for moral in morals]
+        return self.counts[phrase_codes][:, category_codes][:, :, moral_codes]
+
+    def _ranking(self, moral: str, category: str = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Helper to get the counts of a slice and the phrase codes sorted by them (descending, ties in phrase order),
+        computed once per slice.
+        :return: tuple of counts and ranking
+        """
+        key = (moral, category)
+        if key not in self._rankings:
+            position = moral_position(moral)
+            if category is None:
+                values = self.counts[:, :, position].sum(axis=1)
+            else:
+                values = self.counts[:, self._category_codes[category], position]
+            self._rankings[key] = (values, np.argsort(-values, kind="stable"))
+        return self._rankings[key]
+
+    @property
+    def shape(self) -> tuple[int, int, int]:
+        return self.counts.shape
+
+    def __repr__(self):
+        return f"MoralCube({len(self.phrases)} phrases, {len(self.categories)} categories)"
@@ -1,22 +1,69 @@
+import operator
 import re
 from abc import abstractmethod, ABC
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial, reduce
 from typing import List
 
 import numpy as np
 import pandas as pd
-from matplotlib import pyplot as plt
-import matplotlib as mpl
 from pandas import DataFrame, Series
 
+from data_analysis.lexicon import LexiconAutomaton
+from data_analysis.matrix import PhraseMoralMatrix
+from data_analysis.preprocessing import MORAL_ORDER
+
 
 class DataFilter(ABC):
     """
     Data Filter Object that takes a DataFrame and returns a filtered Series.
     """
+    # row wise filters only keep or drop rows of a DataFrame and decide on every row on its own. They implement
+    # `mask()`, so a lazy FilterSequence can push them below concatenation and fuse them
+    row_wise = False
+    # distributive filters give the same result on several DataFrames as `reduce()` on their results per DataFrame,
+    # so `map_reduce()` can filter the DataFrames in a pool without concatenating them
+    distributive = False
+    # streaming filters also take an iterable of DataFrames and consume it one DataFrame at a time
+    streaming = False
 
     def __init__(self, data: DataFrame | Series | List, *args, **kwargs):
         self.data = data
 
+    @classmethod
+    def map_reduce(cls, data_que: List, *args, n_workers: int = 1, processes: bool = False, **kwargs):
+        """
+        filters every item of data_que and combines the results. Distributive filters combine them with `reduce()`,
+        the results of any other filter are concatenated (DataFrames) or summed up (Series). The items of data_que
+        are not modified.
+        :param data_que: list of DataFrames (or of whatever the filter takes)
+        :param n_workers: number of workers for the map step (1 = no pool)
+        :param processes: whether to use a process pool instead of a thread pool, the items are pickled then
+        :return: combined result
+        """
+        if not data_que:
+            raise ValueError("At least one item must be provided.")
+        map_step = partial(_map_filter, cls, args, kwargs)
+        if n_workers > 1 and len(data_que) > 1:
+            pool = ProcessPoolExecutor if processes else ThreadPoolExecutor
+            with pool(max_workers=min(n_workers, len(data_que))) as executor:
+                results = list(executor.map(map_step, data_que))
+        else:
+            results = [map_step(data) for data in data_que]
+        if cls.distributive:
+            return cls.reduce(results)
+        return combine_results(results)
+
+    @classmethod
+    def reduce(cls, results: List) -> Series | DataFrame:
+        """
+        Method of distributive filters: combines the results of the filter on several items into the result on all
+        of them.
+        :param results: list of results of the filter
+        :return: Series or DataFrame
+        """
+        raise NotImplementedError(f"{cls.__name__} is not a distributive filter")
+
     @abstractmethod
     def filter(self, *args, **kwargs) -> Series | DataFrame:
         """
@@ -25,54 +72,198 @@ class DataFilter(ABC):
         :return: Series or DataFrame
         """
 
+    def mask(self, *args, **kwargs) -> np.ndarray:
+        """
+        Method of row wise filters: the rows of the DataFrame that are kept.
+        :return: bool array
+        """
+        raise NotImplementedError(f"{type(self).__name__} is not a row wise filter")
+
 
 class MoralDistributionFilter(DataFilter):
     """
-    Filter for Filtering the Distribution of Moral Values in the DataFrame
+    Filter for Filtering the Distribution of Moral Values in the DataFrame. Also works on the long-form span table and
+    the PhraseMoralMatrix.
     :return: Series
     """
+    distributive = True
 
     def filter(self, *args, **kwargs) -> Series:
+        if isinstance(self.data, PhraseMoralMatrix):
+            return self.data.totals()
+        # long-form span table: count the categorical moral values
+        if "moral" in self.data.columns:
+            return self.data["moral"].value_counts(sort=False).rename(None).rename_axis(None)
         # drop phrase column
         cf = self.data.drop('phrase', axis=1)
         # sum up moral val count
         filtered_data = cf.sum()
         return filtered_data
 
+    @classmethod
+    def reduce(cls, results: List[Series]) -> Series:
+        # moral values missing in some results count 0, like in the concatenated DataFrames
+        return sum_series(results, fill_missing=True)
+
 
 class PhraseCrossOverFilter(DataFilter):
     """
     Filter for Filtering for phrases that occure in more than one moral value.
     :return: Series
     """
+    row_wise = True
+    distributive = True
 
     def filter(self, *args, **kwargs) -> DataFrame:
+        cf = self.data[self.mask(*args, **kwargs)]
+        return cf
+
+    @classmethod
+    def reduce(cls, results: List[DataFrame]) -> DataFrame:
+        return pd.concat(results)
+
+    def mask(self, *args, **kwargs) -> np.ndarray:
         df = self.data
         moral_columns = df.columns[1:]
 
         truth_table = (df[moral_columns] != 0).sum(axis=1) > 1
-        cf = df[truth_table]
-        return cf
+        return truth_table.to_numpy()
+
+
+class MoralCoOccurrenceFilter(DataFilter):
+    """
+    Filter for the co-occurrence of moral values: how many phrases (rows) are labeled with both moral values, for all
+    pairs of moral values at once (the rows PhraseCrossOverFilter returns are the ones adding to the off-diagonal).
+    Works on a DataFrame of the csv layout, a PhraseMoralMatrix, a list of those or any iterable of them, eg. csv
+    chunks, which is streamed chunk by chunk.
+    Optional: "cooccurrence" in kwargs: 'count' (default), 'lift' or 'pmi'
+    :return: DataFrame with the moral values as index and columns
+    """
+    streaming = True
+
+    def filter(self, *args, **kwargs) -> DataFrame:
+        measure = kwargs.get("cooccurrence", "count")
+        counts, n_rows = self.cooccurrence_counts(self.data)
+        if measure == "count":
+            result = counts
+        elif measure in ("lift", "pmi"):
+            occurrences = np.diag(counts).astype(float)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                # observed / expected co-occurrences, NaN for moral values that never occur
+                result = counts * n_rows / np.outer(occurrences, occurrences)
+                if measure == "pmi":
+                    result = np.log2(result)
+        else:
+            raise ValueError(f"Unknown cooccurrence measure: '{measure}'. consider using 'count', 'lift' or 'pmi'")
+        return DataFrame(result, index=MORAL_ORDER, columns=MORAL_ORDER)
+
+    @staticmethod
+    def cooccurrence_counts(data) -> tuple[np.ndarray, int]:
+        """
+        counts the co-occurrences with one matrix product of the binary phrase x moral value matrix per chunk.
+        :param data: DataFrame, PhraseMoralMatrix or an iterable of those
+        :return: tuple of the co-occurrence matrix (diagonal: rows with the moral value) and the number of rows
+        """
+        chunks = [data] if isinstance(data, (DataFrame, PhraseMoralMatrix)) else data
+        counts = np.zeros((len(MORAL_ORDER), len(MORAL_ORDER)))
+        n_rows = 0
+        for chunk in chunks:
+            if isinstance(chunk, PhraseMoralMatrix):
+                values = chunk.counts
+            else:
+                values = chunk.reindex(columns=MORAL_ORDER, fill_value=0).fillna(0).to_numpy()
+            # float for the BLAS matrix product, exact for any realistic number of rows
+            labeled = (values != 0).astype(float)
+            counts += labeled.T @ labeled
+            n_rows += len(labeled)
+        return counts.round().astype(np.int64), n_rows
 
 
 class RegExFilter(DataFilter):
     """
     Filter to filter phrases with a Regex Pattern.
     Expects: "r_pattern" in kwargs
+    Optional: "phrase_index" in kwargs: a PhraseIndex built over the same data, narrows down the phrases the regex
+    has to be run on. Gives the same rows as without it.
     """
+    row_wise = True
 
     def filter(self, *args, **kwargs) -> list[Series]:
+        # Filter the DataFrame based on matched indices
+        filtered_df = self.data[self.mask(*args, **kwargs)]
+
+        return filtered_df
+
+    def mask(self, *args, **kwargs) -> np.ndarray:
         r_pattern = kwargs.get("r_pattern")  # Get the regex pattern from kwargs
         # check for kwarg present
         if not r_pattern:
             raise ValueError("Regex pattern ('r_pattern') is required as kwarg.")
+        phrase_index = kwargs.get("phrase_index")
 
+        if phrase_index is not None and phrase_index.covers(self.data["phrase"]):
+            return phrase_index.contains(self.data["phrase"], r_pattern, flags=re.IGNORECASE)
         # Apply regex pattern to the DataFrame
-        matched_indices = self.data["phrase"].str.contains(r_pattern, flags=re.IGNORECASE, regex=True).astype(bool)
-        # Filter the DataFrame based on matched indices
-        filtered_df = self.data[matched_indices]
+        return self.data["phrase"].str.contains(r_pattern, flags=re.IGNORECASE, regex=True).astype(bool).to_numpy()
 
-        return filtered_df
+
+class LexiconTagFilter(DataFilter):
+    """
+    Filter to tag the phrases with many keyword lexicons at once and get the moral value distribution of every lexicon
+    (the `MoralDistributionFilter` of the rows a lexicon matches). The distinct phrases are scanned once with an
+    Aho-Corasick automaton over the terms of all lexicons, so adding lexicons doesn't add scans. Terms match case
+    insensitive anywhere in a phrase, like `RegExFilter` with the escaped term.
+    Expects: "lexicons" in kwargs: dictionary mapping the name of a lexicon to its terms, or a LexiconAutomaton to reuse
+    :return: DataFrame with the lexicons as index and the moral values as columns
+    """
+    distributive = True
+
+    def filter(self, *args, **kwargs) -> DataFrame:
+        automaton = self._automaton(kwargs)
+        codes, tags = self._tag_phrases(automaton)
+        counts = self.data.drop("phrase", axis=1)
+        # sum up the counts per distinct phrase first, every lexicon is a sum over the phrases it matches
+        phrase_counts = np.zeros((tags.shape[0], counts.shape[1]), dtype=np.result_type(*counts.dtypes))
+        matched = codes >= 0
+        # missing counts are skipped like in the MoralDistributionFilter
+        np.add.at(phrase_counts, codes[matched], counts.fillna(0).to_numpy()[matched])
+        return DataFrame(tags.T.astype(phrase_counts.dtype) @ phrase_counts, index=automaton.names,
+                         columns=counts.columns)
+
+    def tags(self, *args, **kwargs) -> DataFrame:
+        """
+        the lexicons every row matches.
+        :return: bool DataFrame with the index of the data and one column per lexicon
+        """
+        automaton = self._automaton(kwargs)
+        codes, tags = self._tag_phrases(automaton)
+        # rows with a missing phrase match no lexicon
+        row_tags = np.zeros((len(codes), len(automaton.names)), dtype=bool)
+        matched = codes >= 0
+        row_tags[matched] = tags[codes[matched]]
+        return DataFrame(row_tags, index=self.data.index, columns=automaton.names)
+
+    @classmethod
+    def reduce(cls, results: List[DataFrame]) -> DataFrame:
+        return pd.concat(results).groupby(level=0, sort=False).sum()
+
+    def _tag_phrases(self, automaton: LexiconAutomaton) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Helper to tag every distinct phrase.
+        :return: tuple of the phrase code of every row (-1 if missing) and the tags of the distinct phrases
+        """
+        codes, uniques = pd.factorize(self.data["phrase"])
+        return codes, automaton.tag(uniques)
+
+    @staticmethod
+    def _automaton(kwargs: dict) -> LexiconAutomaton:
+        lexicons = kwargs.get("lexicons")
+        # check for kwarg present
+        if not lexicons:
+            raise ValueError("Lexicons ('lexicons') are required as kwarg.")
+        if isinstance(lexicons, LexiconAutomaton):
+            return lexicons
+        return LexiconAutomaton(lexicons)
 
 
 # Util Adapter Classes
@@ -104,17 +295,15 @@ class ConcatMultipleDataFrames(DataFilter):
 
 
 class SumUpSeries(DataFilter):
-    """Adapter to sum up a list of Series element-wise."""
+    """Adapter to sum up a list of Series element-wise. The Series are not modified."""
+    distributive = True
+
     def filter(self, *args, **kwargs) -> Series:
-        series = self.data
-        res_srs = None
-        # loop over series
-        for srs in series:
-            if res_srs is None:
-                res_srs = srs
-            else:
-                res_srs += srs
-        return res_srs
+        return sum_series(list(self.data))
+
+    @classmethod
+    def reduce(cls, results: List[Series]) -> Series:
+        return sum_series(results)
 
 
 class SeriesToDataFrameAdapter(DataFilter):
@@ -139,6 +328,44 @@ class Void(DataFilter):
     def filter(self, *args, **kwargs) -> Series | DataFrame:
         return self.data
 
+def sum_series(series: List[Series], fill_missing: bool = False) -> Series:
+    """
+    sums up Series element-wise into a new Series. Series with the same index are stacked and summed up in numpy.
+    :param series: list of Series
+    :param fill_missing: whether labels missing in some of the Series count 0, otherwise they are NaN like with `+`
+    :return: Series or None if series is empty
+    """
+    if not series:
+        return None
+    first = series[0]
+    if all(srs.index.equals(first.index) for srs in series[1:]):
+        values = np.stack([srs.to_numpy() for srs in series]).sum(axis=0)
+        return Series(values, index=first.index, name=first.name)
+    if fill_missing:
+        return pd.concat(series, axis=1).sum(axis=1)
+    return reduce(operator.add, series)
+
+
+def combine_results(results: List) -> Series | DataFrame | List:
+    """
+    combines the results of a filter on several items: DataFrames are concatenated at once and Series summed up.
+    :param results: list of results
+    :return: combined result, the list itself for any other results
+    """
+    if all(isinstance(result, DataFrame) for result in results):
+        return pd.concat(results)
+    if all(isinstance(result, Series) for result in results):
+        return sum_series(results)
+    return results
+
+
+def _map_filter(data_filter, args: tuple, kwargs: dict, data):
+    """
+    map step of `DataFilter.map_reduce()`, on module level so process pools can pickle it.
+    """
+    return data_filter(data).filter(*args, **kwargs)
+
+
 if __name__ == "__main__":
     df = pd.read_csv("../data/output/DE-Interviews-NEG_lemmatized.csv")
     filter = PhraseCrossOverFilter(df)
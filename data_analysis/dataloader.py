@@ -1,13 +1,20 @@
 from abc import ABC, abstractstaticmethod, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import List
+from typing import List, Iterator, Tuple
 
 import pandas as pd
 from pandas import DataFrame, Series
 
-MFT_SET = {"Care", "Harm", "Fairness", "Cheating", "Loyalty", "Betrayal", "Authority", "Subversion", "Purity",
-           "Degradation", "Liberty",
-           "Oppression", "OTHER"}
+from data_analysis.aggregates import AggregateStore
+from data_analysis.cache import ProcessedDataCache
+from data_analysis.data_filter import MoralDistributionFilter
+from data_analysis.preprocessing import clean_spans, merge_spans, validate_spans, collapse_spans, \
+    to_span_table, span_table
+
+# bump whenever the output of the preprocessing changes, invalidates the processed data cache
+LOADER_VERSION = "3"
 
 CONFIG = {
     "file_path": "../data/",
@@ -41,17 +48,16 @@ class DataLoaderInterface(ABC):
 
     @staticmethod
     @abstractmethod
-    def _clean_data(data: DataFrame) -> DataFrame:
+    def _clean_data(spans: Series) -> Series:
         pass
 
     @staticmethod
     @abstractmethod
-    def _validate_split(row: Series) -> Series:
+    def _validate_split(spans: Series) -> Series:
         pass
 
-    @staticmethod
     @abstractmethod
-    def _merge_columns(row: Series) -> Series:
+    def _merge_columns(self, data: DataFrame) -> Series:
         pass
 
     @abstractmethod
@@ -66,6 +72,107 @@ class DataLoaderInterface(ABC):
     def __repr__(self):
         return "DataManager object"
 
+    def _preprocess(self, raw_data: DataFrame) -> DataFrame:
+        """
+        Runs the columnar preprocessing: drop cols, merge, clean and validate the spans. The spans are kept in one long
+        Series the whole time and only collapsed into the 'moral_werte' lists at the very end. If "long_form" is set
+        in the config, the long-form span table is returned instead.
+        :param raw_data: DataFrame as read from the file
+        :return: DataFrame with the 'moral_werte' column or span table
+        """
+        data = self._reformat(raw_data)
+        spans = self._merge_columns(data)
+        spans = self._clean_data(spans)
+        spans = self._validate_split(spans)
+        if self.config.get("long_form"):
+            return to_span_table(spans, data.index)
+        data['moral_werte'] = collapse_spans(spans, data.index)
+        return data
+
+    def _from_processed(self, data: DataFrame) -> DataFrame:
+        """
+        Helper to bring already processed data into the configured form.
+        :param data: DataFrame as read from the file
+        :return: DataFrame, the span table if "long_form" is set in the config
+        """
+        if self.config.get("long_form"):
+            return span_table(data)
+        return data
+
+    @staticmethod
+    def _read_header(path: Path) -> pd.Index:
+        """
+        Helper to read only the column labels of a xlsx or csv file.
+        :param path: Path
+        :return: Index of the column labels
+        """
+        if path.suffix != ".xlsx":
+            return pd.read_csv(path, nrows=0).columns
+        return pd.read_excel(path, nrows=0).columns
+
+    def _projection(self, header: pd.Index) -> tuple[list, dict]:
+        """
+        Helper to work out which columns of a raw export are actually needed and how to read them: the "merge_cols"
+        plus the "id_cols" of the config, or if no "id_cols" are set every column that is not in "drop_cols". The
+        span columns are read as strings, further dtypes can be set with "dtypes" in the config.
+        :param header: column labels of the raw file
+        :return: tuple of the columns to read and their dtypes
+        """
+        merge_cols = self.config["merge_cols"]
+        id_cols = self.config.get("id_cols")
+        if id_cols is None:
+            usecols = [col for col in header if col not in self.config["drop_cols"]]
+        else:
+            usecols = [col for col in header if col in merge_cols or col in id_cols]
+        dtype = {col: "string" for col in merge_cols}
+        dtype.update(self.config.get("dtypes", {}))
+        return usecols, {col: col_type for col, col_type in dtype.items() if col in usecols}
+
+    def _read_raw(self, path: Path, header: pd.Index = None) -> DataFrame:
+        """
+        Helper to read a raw export with only the needed columns and explicit dtypes. Rows without any span are pruned
+        right away.
+        :param path: Path of a xlsx or csv file
+        :param header: column labels of the file, read if not given
+        :return: DataFrame
+        """
+        if header is None:
+            header = self._read_header(path)
+        usecols, dtype = self._projection(header)
+        if path.suffix != ".xlsx":
+            raw_data = pd.read_csv(path, usecols=usecols, dtype=dtype)
+        else:
+            raw_data = pd.read_excel(path, usecols=usecols, dtype=dtype)
+        return self._prune(raw_data)
+
+    def _prune(self, raw_data: DataFrame) -> DataFrame:
+        """
+        Helper to drop the rows where all span columns are empty.
+        :param raw_data: DataFrame
+        :return: DataFrame
+        """
+        return raw_data.dropna(subset=self.config["merge_cols"], how="all")
+
+    def _record_aggregates(self, path: str | Path, data: DataFrame) -> None:
+        """
+        Helper to record the row count and moral value totals of saved data in the aggregate store.
+        :param path: path of the saved csv
+        :param data: processed DataFrame or span table
+        :return: None
+        """
+        if self.aggregates is not None:
+            self.aggregates.put(path, len(data), MoralDistributionFilter(span_table(data)).filter())
+
+    def _cache_key(self, path: Path) -> str | None:
+        """
+        Helper to get the processed data cache key of a file.
+        :param path: Path of the source file
+        :return: str or None if caching is disabled
+        """
+        if self.cache is None or not path.is_file():
+            return None
+        return self.cache.make_key(path, self.config, LOADER_VERSION)
+
 
 class DataLoader:
     @classmethod
@@ -76,6 +183,30 @@ class DataLoader:
         else:
             return FileDataLoader(config)
 
+    @classmethod
+    def cache_info(cls, config: dict) -> DataFrame:
+        """
+        lists the entries of the processed data cache configured in "cache_dir".
+        :param config: config dictionary
+        :return: DataFrame with the columns 'key', 'size' and 'last_used'
+        """
+        cache = ProcessedDataCache.from_config(config)
+        if cache is None:
+            raise ValueError("No cache configured, set 'cache_dir' in the config.")
+        return cache.info()
+
+    @classmethod
+    def clear_cache(cls, config: dict) -> None:
+        """
+        removes all entries from the processed data cache configured in "cache_dir".
+        :param config: config dictionary
+        :return: None
+        """
+        cache = ProcessedDataCache.from_config(config)
+        if cache is None:
+            raise ValueError("No cache configured, set 'cache_dir' in the config.")
+        cache.clear()
+
 
 class FileDataLoader(DataLoaderInterface):
     """
@@ -85,9 +216,21 @@ class FileDataLoader(DataLoaderInterface):
     def __init__(self, conf: dict) -> None:
         self.config = conf
         self.data_path = Path(self.config["file_path"])
-        self.raw_data = self._read_data()
+        self._raw_data = None
         self.data = None
         self.save_path = self.config["data_out_path"] + "_processed.csv"
+        self.cache = ProcessedDataCache.from_config(self.config)
+        self.aggregates = AggregateStore.from_config(self.config)
+
+    @property
+    def raw_data(self) -> DataFrame:
+        """
+        the data as is, only read on first access so cache hits never touch the source file.
+        :return: DataFrame
+        """
+        if self._raw_data is None:
+            self._raw_data = self._read_data()
+        return self._raw_data
 
     def load(self) -> DataFrame:
         """
@@ -95,113 +238,124 @@ class FileDataLoader(DataLoaderInterface):
         :return: DataFrame | list[DataFrame]
         """
         path = self.data_path
-        # for data in something
-        data_stack = []
 
         print(f"loading data from file: {path}")
+        cache_key = self._cache_key(path)
+        if cache_key is not None:
+            data = self.cache.get(cache_key)
+            if data is not None:
+                print("Data loaded from cache, continuing.")
+                self.data = data
+                return data
+
         if self._is_processed():
             print("Data already processed, continuing.")
-            data = pd.read_csv(path)
+            data = self._from_processed(self.raw_data)
             self.data = data
 
         else:
             print(f"processesing data: {path}")
-            data = self._reformat(self.raw_data)
-            data = self._clean_data(data)
-            data['moral_werte'] = data.apply(self._validate_split, axis=1)
+            data = self._preprocess(self._read_raw(self.data_path))
             self.data = data
 
+        if cache_key is not None:
+            self.cache.put(cache_key, data)
         return data
 
+    def iter_chunks(self, chunksize: int) -> Iterator[DataFrame]:
+        """
+        Streaming counterpart to `load()`: reads the csv in chunks of `chunksize` rows and processes every chunk on its
+        own, so memory is bound by the chunk size instead of the file size. Only works for csv files.
+        :param chunksize: number of rows per chunk
+        :return: Iterator of processed DataFrames
+        """
+        if self.data_path.suffix == ".xlsx":
+            raise ValueError(f"Streaming is only supported for csv files, got: {self.data_path}")
+        print(f"streaming data from file: {self.data_path}")
+        if self._is_processed():
+            for chunk in self._whole_rows(pd.read_csv(self.data_path, chunksize=chunksize)):
+                yield self._from_processed(chunk)
+        else:
+            usecols, dtype = self._projection(self._read_header(self.data_path))
+            for chunk in pd.read_csv(self.data_path, chunksize=chunksize, usecols=usecols, dtype=dtype):
+                yield self._preprocess(self._prune(chunk))
+
+    @staticmethod
+    def _whole_rows(chunks: Iterator[DataFrame]) -> Iterator[DataFrame]:
+        """
+        Helper to keep the spans of a source row in one chunk of a span table read back from csv: the spans of the
+        last row_id of a chunk are held back and put in front of the next chunk. Other chunks are passed on as is.
+        :param chunks: Iterator of DataFrames
+        :return: Iterator of DataFrames that end on a row_id boundary
+        """
+        carry = None
+        for chunk in chunks:
+            if carry is not None:
+                chunk = pd.concat([carry, chunk])
+                carry = None
+            if "row_id" not in chunk.columns or chunk.empty:
+                yield chunk
+                continue
+            row_ids = chunk["row_id"].to_numpy()
+            # start of the run of the last row_id, span tables are sorted by row_id
+            start = len(row_ids)
+            while start > 0 and row_ids[start - 1] == row_ids[-1]:
+                start -= 1
+            carry = chunk.iloc[start:]
+            if start:
+                yield chunk.iloc[:start]
+        if carry is not None:
+            yield carry
+
     def save(self) -> None:
         """
         save the processed data
         :return:
         """
         self.data.to_csv(self.save_path, index=False)
+        self._record_aggregates(self.save_path, self.data)
 
     def _reformat(self, raw_data) -> DataFrame:
         """
-        helper that drops specified cols and merges the specified ones.
+        helper that drops specified cols.
         :return: pd.DataFrame clean of unnecessary cols
 
         """
-        # drop cols
-        data = raw_data.drop(self.config["drop_cols"], axis=1)
-        # merge data
-        data['moral_werte'] = data.apply(self._merge_columns, axis=1)
-
+        # drop cols, the ones that were never read in are ignored
+        data = raw_data.drop(self.config["drop_cols"], axis=1, errors="ignore")
         return data
 
     @staticmethod
-    def _clean_data(data: DataFrame) -> DataFrame:
+    def _clean_data(spans: Series) -> Series:
         """
-        Method to clean data from unnecessary whitespaces, hashes
-        :param data: DataFrame
-        :return: DataFrame
+        Method to clean spans from unnecessary whitespaces, hashes and quotation marks
+        :param spans: long Series of spans
+        :return: Series
         """
-        # Remove unnecessary whitespaces, hashes, and quotation marks from the 'moral_werte' column
-        data['moral_werte'] = data['moral_werte'].apply(
-            lambda content: [
-                string.strip().replace("#", "").replace('"', '').replace(u'\u201e', '').replace(u'\u201c', '') for
-                string in content] if content else content
-        )
-
-        # Drop rows with empty 'moral_werte'
-        data = data.dropna(subset=['moral_werte'])
-
-        return data
+        return clean_spans(spans)
 
     @staticmethod
-    def _validate_split(row: pd.Series) -> pd.Series:
+    def _validate_split(spans: Series) -> Series:
         """
-        Validates and processes the 'moral_werte' column by concatenating list items based on specific conditions.
+        Validates the spans by concatenating spans that were split on a semicolon that is part of the text span, ie.
+        spans that don't start with a moral value are glued to the previous span of the same row.
 
         Parameters:
-        - row (pd.Series): A row of a Pandas DataFrame.
+        - spans (pd.Series): long Series of cleaned spans indexed by row position.
 
         Returns:
-        - pd.Series: Processed 'moral_werte' column.
-        """
-        s_list = row['moral_werte']
-        # Check if the list has more than one item
-        if len(s_list) > 1:
-            new_list = [s_list[0]]  # Initialize with the first item
-
-            # Iterate over the remaining items in the list
-            for idx, string in enumerate(s_list[1:], start=1):
-                # Check if string was split on an unsafe semicolon
-                if not any([string.startswith(moral_val) for moral_val in MFT_SET]):
-                    # Concatenate with the previous item in the new list
-                    new_list[-1] += "; " + string
-                else:
-                    # If safe, add as a separate entry in the new list
-                    new_list.append(string)
-
-            return new_list
-        else:
-            # If the list has only one item, return it unchanged
-            return s_list
+        - pd.Series: validated spans indexed by row position.
+        """
+        return validate_spans(spans)
 
-    @staticmethod
-    def _merge_columns(row: Series):
+    def _merge_columns(self, data: DataFrame) -> Series:
         """
-        merges columns and splits on semicolons after evaluating they are eligible as separators and not part of the
-        text span.
-        :param row: Series
-        :return: Series
+        merges the span columns and splits on semicolons. Whether a semicolon was eligible as separator and not part
+        of the text span is evaluated in `_validate_split`.
+        :param data: DataFrame
+        :return: long Series of spans indexed by row position
         """
-        if pd.isna(row['Spans Obj. Moralwerte']) and not pd.isna(row['Spans Subj. Moralwerte']):
-            res_row = row['Spans Subj. Moralwerte'].split(";")
-
-        elif not pd.isna(row['Spans Obj. Moralwerte']) and pd.isna(row['Spans Subj. Moralwerte']):
-            res_row = row['Spans Obj. Moralwerte'].split(";")
-
-        elif not pd.isna(row['Spans Obj. Moralwerte']) and not pd.isna(row['Spans Subj. Moralwerte']):
-            res_row = row['Spans Obj. Moralwerte'].split(";") + row['Spans Subj. Moralwerte'].split(";")
-        else:
-            res_row = []
-        return res_row
+        return merge_spans(data, self.config["merge_cols"])
 
     @staticmethod
     def _check_semicolon(text: str) -> bool:
@@ -243,10 +397,19 @@ class FileDataLoader(DataLoaderInterface):
     def _is_processed(self) -> bool:
         """
         Helper to check whether a df has been processed yet by checking for cols that should be dropped. Naiv
-        implementation: check for column labels that shouldn't be present.
+        implementation: check for column labels that shouldn't be present. Only reads the header if the data wasn't
+        read yet.
         :return: bool
         """
-        if "Label Obj. Moralwerte" in self.raw_data:
+        if self._raw_data is not None:
+            header = self._raw_data.columns
+        else:
+            try:
+                header = self._read_header(self.data_path)
+            except FileNotFoundError:
+                # let _read_data ask for a valid path
+                header = self.raw_data.columns
+        if "Label Obj. Moralwerte" in header:
             return False
         return True
 
@@ -262,31 +425,88 @@ class DirDataLoader(DataLoaderInterface):
     def __init__(self, conf: dict) -> None:
         self.config = conf
         self.data_path = Path(self.config["file_path"])
-        self.raw_data = self._read_data()
+        self._raw_data = None
         self.data = None
         self.save_path = self.config["data_out_path"] + "_processed.csv"
+        self.cache = ProcessedDataCache.from_config(self.config)
+        self.aggregates = AggregateStore.from_config(self.config)
+
+    @property
+    def raw_data(self) -> List[DataFrame]:
+        """
+        the data of all files as is, only read on first access.
+        :return: list of DataFrames
+        """
+        if self._raw_data is None:
+            self._raw_data = self._read_data()
+        return self._raw_data
 
-    def load(self) -> List[DataFrame]:
+    def load(self, n_workers: int = None) -> List[DataFrame]:
         """
-        Method to load, validate and process data. Can load dirs and files.
+        Method to load, validate and process data. Can load dirs and files. The files are loaded in sorted order, each
+        DataFrame is labeled with its source file name in `attrs["file_name"]`.
+        :param n_workers: number of worker processes to parse and preprocess the files in, defaults to the
+        "n_workers" config value (1 = no process pool)
         :return: DataFrame | list[DataFrame]
         """
         path = self.data_path
-        files = [file for file in path.iterdir() if file.is_file()]
+        files = self.list_files(path)
+        n_workers = n_workers or self.config.get("n_workers", 1)
         print(f"loading data from dir: {path}")
-        data = []
-        if self._is_processed():
-            for file in files:
-                print(f"loading data from file: {file}")
-                data_temp = pd.read_csv(file)
-                data.append(data_temp)
+        if n_workers > 1 and len(files) > 1:
+            with ProcessPoolExecutor(max_workers=min(n_workers, len(files))) as executor:
+                # map keeps the order of the files
+                data = list(executor.map(partial(_load_file_worker, self.config), files))
         else:
-            for raw_data in self.raw_data:
-                print(f"processesing data...")
-                data_temp = self._reformat(raw_data)
-                data_temp = self._clean_data(data_temp)
-                data_temp['moral_werte'] = data_temp.apply(self._validate_split, axis=1)
-                data.append(data_temp)
+            data = [self._load_file(file) for file in files]
+        self.data = data
+        return data
+
+    def iter_load(self) -> Iterator[Tuple[str, DataFrame]]:
+        """
+        Lazy counterpart to `load()`: yields the processed files one at a time, so only about one file is held in
+        memory. Every file is read exactly once.
+        :return: Iterator of (file name, DataFrame) pairs, in the order of `list_files()`
+        """
+        print(f"loading data lazily from dir: {self.data_path}")
+        for file in self.list_files(self.data_path):
+            yield file.name, self._load_file(file)
+
+    @staticmethod
+    def list_files(path: Path) -> List[Path]:
+        """
+        lists the files of a dir in a deterministic order.
+        :param path: Path of the dir
+        :return: sorted list of Paths
+        """
+        return sorted(file for file in Path(path).iterdir() if file.is_file())
+
+    def _load_file(self, file: Path) -> DataFrame:
+        """
+        Helper to load and process a single file of the dir, served from the cache if possible.
+        :param file: Path
+        :return: DataFrame
+        """
+        cache_key = self._cache_key(file)
+        if cache_key is not None:
+            data = self.cache.get(cache_key)
+            if data is not None:
+                print(f"loading cached data for file: {file}")
+                data.attrs["file_name"] = file.name
+                return data
+
+        # decide from the header alone, the file itself is only read once
+        header = self._read_header(file)
+        if self._is_processed(header):
+            print(f"loading data from file: {file}")
+            data = self._from_processed(self._read_file(file))
+        else:
+            print(f"processesing data: {file}")
+            data = self._preprocess(self._read_raw(file, header))
+
+        data.attrs["file_name"] = file.name
+        if cache_key is not None:
+            self.cache.put(cache_key, data)
         return data
 
     def save(self) -> None:
@@ -295,88 +515,54 @@ class DirDataLoader(DataLoaderInterface):
         :return:
         """
         for df in self.data:
-            save_path = self.save_path + df.name
+            save_path = self.save_path + df.attrs["file_name"]
             df.to_csv(save_path, index=False)
+            self._record_aggregates(save_path, df)
 
     def _reformat(self, raw_data: DataFrame) -> DataFrame:
         """
-        helper that drops specified cols and merges the specified ones.
+        helper that drops specified cols.
         :return: pd.DataFrame clean of unnecessary cols
         """
-        # drop cols
-        data = raw_data.drop(self.config["drop_cols"], axis=1)
-        # merge data
-        data['moral_werte'] = data.apply(self._merge_columns, axis=1)
+        # drop cols, the ones that were never read in are ignored
+        data = raw_data.drop(self.config["drop_cols"], axis=1, errors="ignore")
         return data
 
     @staticmethod
-    def _validate_split(row: Series) -> Series:
-        s_list = row['moral_werte']
-        # Check if the list has more than one item
-        if len(s_list) > 1:
-            new_list = [s_list[0]]  # Initialize with the first item
-
-            # Iterate over the remaining items in the list
-            for idx, string in enumerate(s_list[1:], start=1):
-                # Check if string was split on an unsafe semicolon
-                if not any([string.startswith(moral_val) for moral_val in MFT_SET]):
-                    # Concatenate with the previous item in the new list
-                    new_list[-1] += "; " + string
-                else:
-                    # If safe, add as a separate entry in the new list
-                    new_list.append(string)
-
-            return new_list
-        else:
-            # If the list has only one item, return it unchanged
-            return s_list
-
-    @staticmethod
-    def _clean_data(data: DataFrame) -> DataFrame:
+    def _validate_split(spans: Series) -> Series:
         """
-        method to clean data from unnecessary whitespaces, hashes
-        :param data: DataFrame
-        :return: DataFrame
+        concatenates spans that were split on a semicolon that is part of the text span.
+        :param spans: long Series of cleaned spans indexed by row position
+        :return: Series
         """
-        # Remove unnecessary whitespaces, hashes, and quotation marks from the 'moral_werte' column
-        data['moral_werte'] = data['moral_werte'].apply(
-            lambda content: [
-                string.strip().replace("#", "").replace('"', '').replace(u'\u201e', '').replace(u'\u201c', '') for
-                string in content] if content else content
-        )
-
-        # Drop rows with empty 'moral_werte'
-        data = data.dropna(subset=['moral_werte'])
-
-        return data
+        return validate_spans(spans)
 
     @staticmethod
-    def _merge_columns(row: Series):
+    def _clean_data(spans: Series) -> Series:
         """
-        merges columns and splits on semicolons after evaluating they are eligible as separators and not part of the
-        text span.
-        :param row: Series
+        method to clean spans from unnecessary whitespaces, hashes and quotation marks
+        :param spans: long Series of spans
         :return: Series
         """
-        if pd.isna(row['Spans Obj. Moralwerte']) and not pd.isna(row['Spans Subj. Moralwerte']):
-            res_row = row['Spans Subj. Moralwerte'].split(";")
-
-        elif not pd.isna(row['Spans Obj. Moralwerte']) and pd.isna(row['Spans Subj. Moralwerte']):
-            res_row = row['Spans Obj. Moralwerte'].split(";")
+        return clean_spans(spans)
 
-        elif not pd.isna(row['Spans Obj. Moralwerte']) and not pd.isna(row['Spans Subj. Moralwerte']):
-            res_row = row['Spans Obj. Moralwerte'].split(";") + row['Spans Subj. Moralwerte'].split(";")
-        else:
-            res_row = []
-        return res_row
+    def _merge_columns(self, data: DataFrame) -> Series:
+        """
+        merges the span columns and splits on semicolons.
+        :param data: DataFrame
+        :return: long Series of spans indexed by row position
+        """
+        return merge_spans(data, self.config["merge_cols"])
 
-    def _is_processed(self) -> bool:
+    def _is_processed(self, header: pd.Index = None) -> bool:
         """
         Helper to check whether or not a df has been processed yet by checking for cols that should be dropped.
+        :param header: column labels of the file to check, defaults to the header of the first file of the dir
         :return: bool
         """
-
-        if "Label Obj. Moralwerte" in next(iter(self.raw_data)):
+        if header is None:
+            header = self._read_header(self.list_files(self.data_path)[0])
+        if "Label Obj. Moralwerte" in header:
             return False
         return True
 
@@ -386,25 +572,41 @@ class DirDataLoader(DataLoaderInterface):
         :return: DataFrame of exel file as is
         """
         raw_data = []
-        path = Path(self.data_path)
-        files = [file for file in path.iterdir() if file.is_file()]
+        files = self.list_files(self.data_path)
         for file in files:
             try:
-                if file.suffix != ".xlsx":
-                    temp_data = pd.read_csv(file)
-                    raw_data.append(temp_data)
-                else:
-                    temp_data = pd.read_excel(file)
-                    raw_data.append(temp_data)
+                raw_data.append(self._read_file(file))
             except FileNotFoundError:
                 self.data_path = Path(input(f"File {self.config['file_path']} not present, please enter a valid path:"))
                 self._read_data()
         return raw_data
 
+    @staticmethod
+    def _read_file(file: Path) -> DataFrame:
+        """
+        Helper to read in a single xlsx or csv file as DataFrame.
+        :param file: Path
+        :return: DataFrame of the file as is
+        """
+        if file.suffix != ".xlsx":
+            return pd.read_csv(file)
+        return pd.read_excel(file)
+
     def __repr__(self):
         return "DataManager object for dirs"
 
 
+def _load_file_worker(config: dict, file: Path) -> DataFrame:
+    """
+    loads a single file of a dir in a worker process. Only the config is sent to the worker, not the loader with all
+    its data.
+    :param config: config dictionary
+    :param file: Path
+    :return: DataFrame
+    """
+    return DirDataLoader(config)._load_file(file)
+
+
 if __name__ == "__main__":
     dl = DataLoader.get_loader(CONFIG)
     print(dl)
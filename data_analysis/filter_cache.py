@@ -0,0 +1,282 @@
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Type
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame, Series
+
+from data_analysis.data_filter import DataFilter
+
+DEFAULT_MAX_BYTES = 256 * 1024 ** 2  # 256 MiB
+# bump whenever the output of any filter changes, invalidates the results persisted to disk
+FILTER_CACHE_VERSION = "1"
+# kwargs that only change how a result is computed, not the result
+NEUTRAL_KWARGS = {"phrase_index"}
+
+
+class FilterCache:
+    """
+    Opt-in LRU cache for the results of DataFilter and FilterSequence runs. Entries are keyed by a fingerprint of the
+    input data (the hash of every row, the columns and the dtypes), the filter classes and the args and kwargs, so
+    a changed frame is filtered again. The least recently used results are evicted once they take more than
+    `max_bytes` of memory. With a `path` the results are also pickled to that directory and found again by later
+    sessions. Runs on data or kwargs that can't be fingerprinted (eg. arbitrary objects) are not cached.
+    """
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, path: str | Path = None):
+        """
+        :param max_bytes: memory limit of the cached results
+        :param path: optional directory to persist the results to
+        """
+        self.max_bytes = max_bytes
+        self.path = Path(path) if path is not None else None
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.uncached = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, max_bytes: int = None, path: str | Path = None):
+        """
+        get the cache shared by the whole process.
+        :param max_bytes: new memory limit of the shared cache, unchanged if None
+        :param path: new directory to persist to, unchanged if None
+        :return: FilterCache
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            if max_bytes is not None:
+                cls._shared.max_bytes = max_bytes
+            if path is not None:
+                cls._shared.path = Path(path)
+            return cls._shared
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """
+        creates a cache if "filter_cache_size" or "filter_cache_path" is set in the config.
+        :param config: config dictionary
+        :return: FilterCache | None
+        """
+        max_bytes = config.get("filter_cache_size")
+        path = config.get("filter_cache_path")
+        if max_bytes is None and not path:
+            return None
+        return cls(max_bytes if max_bytes is not None else DEFAULT_MAX_BYTES, path)
+
+    def filter(self, data, filters: Type[DataFilter] | List[Type[DataFilter]], *args, **kwargs):
+        """
+        runs a DataFilter or a stack of them (like an eager FilterSequence) on data, or returns the cached result.
+        :param data: DataFrame, Series or list of those
+        :param filters: DataFilter class or list of DataFilter classes
+        :return: result of the (last) filter
+        """
+        filter_stack = filters if isinstance(filters, (list, tuple)) else [filters]
+
+        def run():
+            result = data
+            for data_filter in filter_stack:
+                result = data_filter(result).filter(*args, **kwargs)
+            return result
+
+        return self.get_or_run(self.make_key(data, filter_stack, args, kwargs), run)
+
+    def map_reduce(self, data_filter: Type[DataFilter], data_que: List, *args, n_workers: int = 1,
+                   processes: bool = False, **kwargs):
+        """
+        runs `data_filter.map_reduce()` on data_que, or returns the cached result.
+        :param data_filter: DataFilter class
+        :param data_que: list of DataFrames
+        :param n_workers: number of workers for the map step, doesn't change the result
+        :param processes: whether to use a process pool, doesn't change the result
+        :return: combined result
+        """
+        # the combined result differs from running the filter on the list itself
+        key = self.make_key(data_que, [data_filter], args, dict(kwargs, map_reduce=True))
+        return self.get_or_run(key, lambda: data_filter.map_reduce(data_que, *args, n_workers=n_workers,
+                                                                   processes=processes, **kwargs))
+
+    def get_or_run(self, key: str | None, run):
+        """
+        get the result of a key or compute and store it.
+        :param key: key of `make_key()`, the result isn't cached if None
+        :param run: function without arguments computing the result
+        :return: result
+        """
+        if key is None:
+            self.uncached += 1
+            return run()
+        with self._lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self._copy(self.entries[key][0])
+        result = self._load(key)
+        if result is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            result = run()
+            self._dump(key, result)
+        self._store(key, result)
+        return self._copy(result)
+
+    @classmethod
+    def make_key(cls, data, filter_stack: List[Type[DataFilter]], args: tuple = (), kwargs: dict = None) -> str | None:
+        """
+        fingerprints a filter run.
+        :param data: input of the first filter
+        :param filter_stack: list of DataFilter classes
+        :param args: positional args of the filters
+        :param kwargs: kwargs of the filters
+        :return: hex digest or None if the run can't be fingerprinted
+        """
+        digest = hashlib.sha1(f"v{FILTER_CACHE_VERSION};".encode())
+        kwargs = {name: value for name, value in (kwargs or {}).items() if name not in NEUTRAL_KWARGS}
+        try:
+            cls._update(digest, data)
+            for data_filter in filter_stack:
+                digest.update(f"{data_filter.__module__}.{data_filter.__qualname__};".encode())
+            cls._update(digest, list(args))
+            for name in sorted(kwargs):
+                digest.update(f"{name}=".encode())
+                cls._update(digest, kwargs[name])
+        except TypeError:
+            return None
+        return digest.hexdigest()
+
+    def stats(self) -> dict:
+        """
+        hit and miss counts for tuning.
+        :return: dict
+        """
+        lookups = self.hits + self.disk_hits + self.misses
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses, "uncached": self.uncached,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "entries": len(self.entries), "nbytes": self.nbytes, "max_bytes": self.max_bytes}
+
+    def clear(self, disk: bool = False) -> None:
+        """
+        removes all entries from the cache.
+        :param disk: whether to also delete the persisted results
+        :return: None
+        """
+        with self._lock:
+            self.entries.clear()
+            self.nbytes = 0
+        if disk and self.path is not None and self.path.exists():
+            for file in self.path.glob("*.pkl"):
+                file.unlink()
+
+    @classmethod
+    def _update(cls, digest, value) -> None:
+        """
+        Helper to feed a value into the fingerprint.
+        :raises TypeError: if the value can't be fingerprinted
+        """
+        if isinstance(value, (DataFrame, Series)):
+            if isinstance(value, DataFrame):
+                header = f"DataFrame{value.shape}{list(value.columns)}{list(value.dtypes.astype(str))};"
+            else:
+                header = f"Series{value.shape}{value.name!r}{value.dtype};"
+            digest.update(header.encode())
+            digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+        elif isinstance(value, np.ndarray) and value.dtype != object:
+            digest.update(f"ndarray{value.shape}{value.dtype};".encode())
+            digest.update(np.ascontiguousarray(value).tobytes())
+        elif isinstance(value, (list, tuple)):
+            digest.update(f"{type(value).__name__}[{len(value)}];".encode())
+            for item in value:
+                cls._update(digest, item)
+        elif isinstance(value, dict):
+            digest.update(f"dict[{len(value)}];".encode())
+            for name in sorted(value, key=repr):
+                cls._update(digest, name)
+                cls._update(digest, value[name])
+        elif value is None or isinstance(value, (str, bytes, bool, int, float)):
+            digest.update(f"{type(value).__name__}:{value!r};".encode())
+        else:
+            raise TypeError(f"can't fingerprint {type(value).__name__}")
+
+    @classmethod
+    def _nbytes(cls, value) -> int:
+        if isinstance(value, DataFrame):
+            return int(value.memory_usage(deep=True).sum())
+        if isinstance(value, Series):
+            return int(value.memory_usage(deep=True))
+        if isinstance(value, np.ndarray):
+            return value.nbytes
+        if isinstance(value, (list, tuple)):
+            return sum(cls._nbytes(item) for item in value)
+        return sys.getsizeof(value)
+
+    @classmethod
+    def _copy(cls, value):
+        # callers may change the returned result in place (eg. `result += other`), the cached one must not change
+        if isinstance(value, (DataFrame, Series, np.ndarray)):
+            return value.copy()
+        if isinstance(value, list):
+            return [cls._copy(item) for item in value]
+        return value
+
+    def _store(self, key: str, result) -> None:
+        nbytes = self._nbytes(result)
+        with self._lock:
+            if key not in self.entries:
+                self.entries[key] = (self._copy(result), nbytes)
+                self.nbytes += nbytes
+            self._evict()
+
+    def _evict(self) -> None:
+        """
+        removes the least recently used entries until the cache fits into max_bytes, the newest entry is always kept.
+        :return: None
+        """
+        while self.nbytes > self.max_bytes and len(self.entries) > 1:
+            _, (_, nbytes) = self.entries.popitem(last=False)
+            self.nbytes -= nbytes
+
+    def _load(self, key: str):
+        if self.path is None:
+            return None
+        file = self.path / f"{key}.pkl"
+        if not file.exists():
+            return None
+        try:
+            with open(file, "rb") as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def _dump(self, key: str, result) -> None:
+        """
+        Helper to persist a result. The file is replaced atomically, so concurrent runs never read a broken result.
+        :return: None
+        """
+        if self.path is None or result is None:
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path / f"{key}.pkl")
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def __repr__(self):
+        return f"FilterCache({len(self.entries)} entries, {self.nbytes} of {self.max_bytes} bytes)"
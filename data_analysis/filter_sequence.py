@@ -1,10 +1,29 @@
 import re
-from typing import Type, Union, List
+from typing import Type, Union, List, NamedTuple, Tuple
 
+import numpy as np
 import pandas as pd
 from pandas import DataFrame, Series
 
-from data_analysis.data_filter import DataFilter, RegExFilter, DataFrameToSeriesList, ConcatMultipleDataFrames
+from data_analysis.data_filter import DataFilter, RegExFilter, DataFrameToSeriesList, ConcatMultipleDataFrames, Void
+from data_analysis.filter_cache import FilterCache
+from data_analysis.partitioned import PartitionedDataset
+
+
+class PlanStep(NamedTuple):
+    """
+    a step of a lazy FilterSequence plan.
+    - 'pushdown': fused row wise filters applied to every input DataFrame before they are concatenated
+    - 'concat': the concatenation of the input DataFrames
+    - 'mask': fused row wise filters, one mask and a single copy of the kept rows
+    - 'filter': any other filter, run as is
+    """
+    op: str
+    filters: Tuple[Type[DataFilter], ...]
+
+    def __str__(self):
+        names = ", ".join(data_filter.__name__ for data_filter in self.filters)
+        return f"{self.op}({names})"
 
 
 class FilterSequence:
@@ -31,16 +50,23 @@ class FilterSequence:
     ```
     """
 
-    def __init__(self, data: DataFrame | Series | List, filter_stack: List[Type[DataFilter]]):
+    def __init__(self, data: DataFrame | Series | List, filter_stack: List[Type[DataFilter]], lazy: bool = False,
+                 cache: FilterCache | bool = None):
         """
         Initializes a FilterSequence object.
 
         Parameters:
-        - :data:  DataFrame Series or List of those: The input Data to be filtered.
+        - :data:  DataFrame Series or List of those: The input Data to be filtered. Or a PartitionedDataset to filter
+          csvs on disk one partition at a time, see `PartitionedDataset.filter()`.
         - filter_stack (list[Type[DataFilter]]): A list of DataFilter classes representing the sequence of filters to be applied.
+        - lazy (bool): run an optimized plan instead of every filter in turn, see `plan()`. Gives the same result.
+        - cache (FilterCache | bool): FilterCache to reuse the results of earlier runs on the same data and kwargs,
+          True for the cache shared by the process.
         """
         self.data = data
         self.filter_stack = filter_stack
+        self.lazy = lazy
+        self.cache = FilterCache.shared() if cache is True else cache or None
 
     def filter(self, *args, **kwargs) -> Union[DataFrame, Series]:
         """
@@ -48,6 +74,16 @@ class FilterSequence:
          Returns:
          - DataFrame: The filtered DataFrame.
          """
+        if self.cache is not None:
+            key = self.cache.make_key(self.data, self.filter_stack, args, kwargs)
+            return self.cache.get_or_run(key, lambda: self._run(*args, **kwargs))
+        return self._run(*args, **kwargs)
+
+    def _run(self, *args, **kwargs) -> Union[DataFrame, Series]:
+        if isinstance(self.data, PartitionedDataset):
+            return self.data.filter(self.filter_stack, *args, **kwargs)
+        if self.lazy:
+            return self._run_plan(self.plan(), *args, **kwargs)
         result = self.data
 
         for data_filter in self.filter_stack:
@@ -55,6 +91,88 @@ class FilterSequence:
 
         return result
 
+    def plan(self) -> List[PlanStep]:
+        """
+        Builds the plan of the lazy mode:
+        - `Void` filters are dropped
+        - row wise filters right after concatenating the input DataFrames are pushed below the concatenation, if all
+          DataFrames have the same columns, so only the kept rows are concatenated and the full concatenation is never
+          held in memory (the filters then run once per DataFrame, which costs some time on many small DataFrames)
+        - adjacent row wise filters are fused into one mask, so only the rows kept by all of them are copied
+        :return: list of PlanSteps
+        """
+        stack = [data_filter for data_filter in self.filter_stack if data_filter is not Void]
+        steps = []
+        i = 0
+        while i < len(stack):
+            data_filter = stack[i]
+            row_wise = self._row_wise_run(stack, i + 1)
+            if data_filter is ConcatMultipleDataFrames and not steps and row_wise and self._same_columns():
+                steps.append(PlanStep("pushdown", row_wise))
+                steps.append(PlanStep("concat", (data_filter,)))
+                i += 1 + len(row_wise)
+            elif data_filter.row_wise:
+                fused = self._row_wise_run(stack, i)
+                steps.append(PlanStep("mask", fused))
+                i += len(fused)
+            else:
+                steps.append(PlanStep("filter", (data_filter,)))
+                i += 1
+        return steps
+
+    def explain(self) -> str:
+        """
+        prints the plan of the lazy mode, see `plan()`.
+        :return: str
+        """
+        lines = [f"{'eager' if not self.lazy else 'lazy'} FilterSequence: "
+                 + " -> ".join(data_filter.__name__ for data_filter in self.filter_stack)]
+        for number, step in enumerate(self.plan(), start=1):
+            lines.append(f"  {number}. {step}")
+        text = "\n".join(lines)
+        print(text)
+        return text
+
+    def _run_plan(self, steps: List[PlanStep], *args, **kwargs) -> Union[DataFrame, Series]:
+        result = self.data
+        for step in steps:
+            if step.op == "pushdown":
+                result = [df[self._fused_mask(df, step.filters, *args, **kwargs)] for df in result]
+            elif step.op == "mask":
+                result = result[self._fused_mask(result, step.filters, *args, **kwargs)]
+            else:
+                result = step.filters[0](result).filter(*args, **kwargs)
+        return result
+
+    @staticmethod
+    def _fused_mask(data: DataFrame, filters: Tuple[Type[DataFilter], ...], *args, **kwargs) -> np.ndarray:
+        """
+        Helper to combine the masks of row wise filters. Every filter decides on the rows the previous ones kept.
+        :return: bool array over the rows of data
+        """
+        kept = np.arange(len(data))
+        for data_filter in filters:
+            subset = data if len(kept) == len(data) else data.iloc[kept]
+            kept = kept[data_filter(subset).mask(*args, **kwargs)]
+        mask = np.zeros(len(data), dtype=bool)
+        mask[kept] = True
+        return mask
+
+    @staticmethod
+    def _row_wise_run(stack: List[Type[DataFilter]], start: int) -> Tuple[Type[DataFilter], ...]:
+        end = start
+        while end < len(stack) and stack[end].row_wise:
+            end += 1
+        return tuple(stack[start:end])
+
+    def _same_columns(self) -> bool:
+        # row wise filters only give the same rows before and after concatenating if the columns don't change
+        if not isinstance(self.data, list) or not self.data:
+            return False
+        if not all(isinstance(df, DataFrame) for df in self.data):
+            return False
+        return all(df.columns.equals(self.data[0].columns) for df in self.data)
+
 
 if __name__ == "__main__":
     df = pd.read_csv("E:\Coding\moralization\data\output\DE-Gerichtsurteile-NEG_lemmatized.csv")
@@ -0,0 +1,138 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+from pandas import DataFrame, Series
+
+from data_analysis.data_filter import MoralDistributionFilter
+
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2  # 512 MiB
+
+
+class FrameCache:
+    """
+    In-process LRU cache for result csvs (eg. the output of `occurrences_to_csv`) and their moral value totals.
+    Entries are keyed by path, modification time and size, so a rewritten file is read again. The least recently used
+    frames are evicted once the cached frames take more than `max_bytes` of memory. Cached frames are shared, don't
+    modify them in place.
+    """
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, max_bytes: int = None):
+        """
+        get the cache shared by the whole process.
+        :param max_bytes: new memory limit of the shared cache, unchanged if None
+        :return: FrameCache
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            if max_bytes is not None:
+                cls._shared.max_bytes = max_bytes
+            return cls._shared
+
+    @staticmethod
+    def make_key(path: str | Path) -> tuple:
+        """
+        :param path: path to the csv
+        :return: tuple of resolved path, modification time (ns) and size
+        """
+        stat = os.stat(path)
+        return str(Path(path).resolve()), stat.st_mtime_ns, stat.st_size
+
+    def frame(self, path: str | Path) -> DataFrame:
+        """
+        get the DataFrame of a csv, read on a miss.
+        :param path: path to the csv
+        :return: DataFrame
+        """
+        return self._entry(path)["frame"]
+
+    def totals(self, path: str | Path) -> Series:
+        """
+        get the moral value totals of a csv (the result of the `MoralDistributionFilter`), computed on first use.
+        :param path: path to the csv
+        :return: Series
+        """
+        return self._totals(self._entry(path))
+
+    def summary(self, path: str | Path) -> tuple[int, Series]:
+        """
+        get the row count and the moral value totals of a csv with a single lookup.
+        :param path: path to the csv
+        :return: tuple of row count and moral value totals
+        """
+        entry = self._entry(path)
+        return len(entry["frame"]), self._totals(entry)
+
+    @staticmethod
+    def _totals(entry: dict) -> Series:
+        """
+        Helper to get the totals of an entry, computed on first use. Doesn't count as a lookup.
+        :return: Series
+        """
+        if entry["totals"] is None:
+            entry["totals"] = MoralDistributionFilter(entry["frame"]).filter()
+        return entry["totals"]
+
+    def stats(self) -> dict:
+        """
+        hit and miss counts for tuning.
+        :return: dict
+        """
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self.entries), "nbytes": self.nbytes, "max_bytes": self.max_bytes}
+
+    def clear(self) -> None:
+        """
+        removes all entries from the cache.
+        :return: None
+        """
+        with self._lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def _entry(self, path: str | Path) -> dict:
+        key = self.make_key(path)
+        with self._lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+        self.misses += 1
+        frame = pd.read_csv(path)
+        entry = {"frame": frame, "totals": None, "nbytes": int(frame.memory_usage(deep=True).sum())}
+        with self._lock:
+            # an older version of the file is stale now
+            for stale in [stale for stale in self.entries if stale[0] == key[0] and stale != key]:
+                self.nbytes -= self.entries.pop(stale)["nbytes"]
+            if key not in self.entries:
+                self.entries[key] = entry
+                self.nbytes += entry["nbytes"]
+            self._evict()
+        return entry
+
+    def _evict(self) -> None:
+        """
+        removes the least recently used entries until the cache fits into max_bytes, the newest entry is always kept.
+        :return: None
+        """
+        while self.nbytes > self.max_bytes and len(self.entries) > 1:
+            _, entry = self.entries.popitem(last=False)
+            self.nbytes -= entry["nbytes"]
+
+    def __repr__(self):
+        return f"FrameCache({len(self.entries)} entries, {self.nbytes} of {self.max_bytes} bytes)"
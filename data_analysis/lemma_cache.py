@@ -0,0 +1,140 @@
+import sqlite3
+from collections import OrderedDict
+from pathlib import Path
+
+DEFAULT_MAXSIZE = 100_000
+# pending lemmas are written to disk in batches of this size
+FLUSH_EVERY = 1_000
+
+
+class LemmaCache:
+    """
+    Two tier memoization for lemmas of one spaCy model: an in-memory LRU backed by an optional sqlite store on disk.
+    The store persists between runs and can be shared between worker processes. Entries are keyed by model name,
+    model version and the input text, so updating a model never serves stale lemmas.
+    """
+
+    def __init__(self, model_name: str, model_version: str, path: str | Path = None, maxsize: int = DEFAULT_MAXSIZE):
+        self.model_name = model_name
+        self.model_version = model_version
+        self.path = Path(path) if path else None
+        self.maxsize = maxsize
+        self.memory = OrderedDict()
+        self.pending = {}
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._connection = None
+
+    @classmethod
+    def for_model(cls, nlp, path: str | Path = None, maxsize: int = DEFAULT_MAXSIZE):
+        """
+        creates a cache for a loaded spaCy pipeline, named and versioned after its meta data.
+        :param nlp: spaCy Language
+        :param path: path to the sqlite store, in-memory only if None
+        :param maxsize: number of lemmas held in memory
+        :return: LemmaCache
+        """
+        return cls(*cls.model_id(nlp), path, maxsize)
+
+    @staticmethod
+    def model_id(nlp) -> tuple[str, str]:
+        """
+        :param nlp: spaCy Language
+        :return: tuple of model name (eg. 'de_core_news_lg') and model version
+        """
+        meta = nlp.meta
+        return f"{meta.get('lang')}_{meta.get('name')}", meta.get("version", "")
+
+    def get(self, text: str) -> str | None:
+        """
+        look up the lemma of a text, first in memory then on disk.
+        :param text: str
+        :return: str or None on a miss
+        """
+        if text in self.memory:
+            self.memory.move_to_end(text)
+            self.hits += 1
+            return self.memory[text]
+        if text in self.pending:
+            # evicted from memory but not written yet
+            self.hits += 1
+            self._remember(text, self.pending[text])
+            return self.pending[text]
+        lemma = None
+        if self.path is not None:
+            row = self._db().execute("SELECT lemma FROM lemmas WHERE model = ? AND version = ? AND text = ?",
+                                     (self.model_name, self.model_version, text)).fetchone()
+            lemma = row[0] if row else None
+        if lemma is None:
+            self.misses += 1
+            return None
+        self.disk_hits += 1
+        self._remember(text, lemma)
+        return lemma
+
+    def put(self, text: str, lemma: str) -> None:
+        """
+        store a lemma, it is written to disk with the next flush.
+        :param text: str
+        :param lemma: str
+        :return: None
+        """
+        self._remember(text, lemma)
+        if self.path is not None:
+            self.pending[text] = lemma
+            if len(self.pending) >= FLUSH_EVERY:
+                self.flush()
+
+    def flush(self) -> None:
+        """
+        writes the pending lemmas to disk.
+        :return: None
+        """
+        if not self.pending or self.path is None:
+            return
+        with self._db() as connection:
+            connection.executemany("INSERT OR IGNORE INTO lemmas (model, version, text, lemma) VALUES (?, ?, ?, ?)",
+                                   [(self.model_name, self.model_version, text, lemma)
+                                    for text, lemma in self.pending.items()])
+        self.pending = {}
+
+    def stats(self) -> dict:
+        """
+        hit and miss counts for tuning.
+        :return: dict
+        """
+        lookups = self.hits + self.disk_hits + self.misses
+        return {"model": self.model_name, "version": self.model_version, "hits": self.hits,
+                "disk_hits": self.disk_hits, "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "in_memory": len(self.memory)}
+
+    def _remember(self, text: str, lemma: str) -> None:
+        self.memory[text] = lemma
+        self.memory.move_to_end(text)
+        if len(self.memory) > self.maxsize:
+            self.memory.popitem(last=False)
+
+    def _db(self) -> sqlite3.Connection:
+        """
+        Helper to open the sqlite store lazily, so every (worker) process gets its own connection.
+        :return: sqlite3.Connection
+        """
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=60)
+            # write ahead logging lets several processes read while one writes
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS lemmas (model TEXT, version TEXT, text TEXT, "
+                                     "lemma TEXT, PRIMARY KEY (model, version, text))")
+        return self._connection
+
+    def __getstate__(self):
+        # connections can't be sent to other processes
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        return state
+
+    def __repr__(self):
+        return f"LemmaCache({self.model_name} {self.model_version}, {len(self.memory)} in memory, {self.path})"
@@ -0,0 +1,101 @@
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+
+class LexiconAutomaton:
+    """
+    Aho-Corasick automaton over the terms of many named lexicons (eg. {"freiheit": ["freiheit", "frei"], ...}). A text
+    is scanned once for all terms of all lexicons, so the cost of a scan doesn't grow with the number of lexicons.
+    Matching is case insensitive (both terms and texts are lowercased) and finds terms anywhere in the text, like
+    `RegExFilter` with the escaped terms.
+    """
+
+    def __init__(self, lexicons: Dict[str, Iterable[str]]):
+        """
+        :param lexicons: dictionary mapping the name of a lexicon to its terms
+        """
+        if not lexicons:
+            raise ValueError("At least one lexicon must be provided.")
+        self.names = list(lexicons)
+        # state 0 is the root, every state has its transitions, its fail state and the lexicons it completes as bitmask
+        self.goto: List[dict] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[int] = [0]
+        for position, name in enumerate(self.names):
+            terms = [lexicons[name]] if isinstance(lexicons[name], str) else lexicons[name]
+            for term in terms:
+                if not term:
+                    raise ValueError(f"Lexicon '{name}' contains an empty term.")
+                self._add(term.lower(), 1 << position)
+        self._link()
+
+    def _add(self, term: str, bit: int) -> None:
+        state = 0
+        for char in term:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(0)
+            state = next_state
+        self.output[state] |= bit
+
+    def _link(self) -> None:
+        """
+        Helper to set the fail states breadth first, every state also reports the lexicons of its fail states.
+        :return: None
+        """
+        # the states right below the root fail to the root
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for char, next_state in self.goto[state].items():
+                fail = self.fail[state]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[next_state] = self.goto[fail].get(char, 0)
+                self.output[next_state] |= self.output[self.fail[next_state]]
+                queue.append(next_state)
+
+    def scan(self, text: str) -> int:
+        """
+        scans a text for the terms of all lexicons.
+        :param text: str
+        :return: bitmask of the matched lexicons, bit i is the i-th lexicon of `names`
+        """
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        matched = 0
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            matched |= output[state]
+        return matched
+
+    def tag(self, texts: Iterable) -> np.ndarray:
+        """
+        tags texts with the lexicons they match, missing texts (NaN) match none.
+        :param texts: iterable of str
+        :return: bool array of shape (texts, lexicons)
+        """
+        texts = list(texts)
+        tags = np.zeros((len(texts), len(self.names)), dtype=bool)
+        for row, text in enumerate(texts):
+            if not isinstance(text, str):
+                continue
+            matched = self.scan(text)
+            # only visit the set bits
+            while matched:
+                lowest = matched & -matched
+                tags[row, lowest.bit_length() - 1] = True
+                matched ^= lowest
+        return tags
+
+    def __len__(self):
+        return len(self.goto)
+
+    def __repr__(self):
+        return f"LexiconAutomaton({len(self.names)} lexicons, {len(self.goto)} states)"
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from data_analysis.cache import ProcessedDataCache
+
+# bump whenever the output of the counting changes, invalidates all manifest entries
+MANIFEST_VERSION = "1"
+MANIFEST_NAME = "manifest.json"
+
+
+class RunManifest:
+    """
+    Records which output a run wrote for which input file, keyed by the content of the input, the config, the spaCy
+    model (name and version) and the run settings. A rerun only has to process files that are new, changed or whose
+    output is missing, so an interrupted run resumes where it stopped. Every finished file is written to disk right
+    away.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.entries = self._read()
+
+    def output(self, file_name: str, key: str) -> Path | None:
+        """
+        get the output of a file if it is up to date.
+        :param file_name: name of the input file
+        :param key: current run key of the input file, see `make_key`
+        :return: Path of the output or None if the file has to be (re)processed
+        """
+        entry = self.entries.get(file_name)
+        if entry is None or entry["key"] != key or not Path(entry["output"]).exists():
+            return None
+        return Path(entry["output"])
+
+    def record(self, file_name: str, key: str, output: str | Path, **info) -> None:
+        """
+        records the output of a finished file and writes the manifest to disk.
+        :param file_name: name of the input file
+        :param key: run key of the input file
+        :param output: path of the output
+        :param info: additional (json serializable) information, eg. the model
+        :return: None
+        """
+        self.entries[file_name] = {"key": key, "output": str(output), **info}
+        self.save()
+
+    def save(self) -> None:
+        """
+        writes the manifest to disk. The file is replaced atomically, so a killed run never leaves a broken manifest.
+        :return: None
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump({"version": MANIFEST_VERSION, "files": self.entries}, file, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @staticmethod
+    def make_key(path: str | Path, config: dict, loader_version: str, **settings) -> str:
+        """
+        builds the run key of an input file from its content, the preprocessing config and the run settings.
+        :param path: path to the input file
+        :param config: config dictionary
+        :param loader_version: version of the loader that processes the data
+        :param settings: everything else the output depends on, eg. model name and version or aggregate
+        :return: str hex digest
+        """
+        data_key = ProcessedDataCache.make_key(path, config, loader_version)
+        settings = json.dumps(dict(settings, manifest_version=MANIFEST_VERSION), sort_keys=True, default=str)
+        return hashlib.sha256((data_key + settings).encode()).hexdigest()
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path) as file:
+                manifest = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        if manifest.get("version") != MANIFEST_VERSION:
+            return {}
+        return manifest.get("files", {})
+
+    def __repr__(self):
+        return f"RunManifest({self.path}, {len(self.entries)} files)"
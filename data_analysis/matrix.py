@@ -0,0 +1,193 @@
+from pathlib import Path
+from typing import Iterable, List
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame, Series
+
+from data_analysis.counting import count_codes
+from data_analysis.preprocessing import MORAL_ORDER, moral_position
+
+
+class PhraseMoralMatrix:
+    """
+    Phrase x moral value count matrix. Phrases are integer coded against a vocabulary and the counts are held in a
+    compact numpy matrix (one row per phrase, or per phrase and source row if not aggregated; one column per moral
+    value in MORAL_ORDER). Converts from and to the csv layout of `occurrences_to_csv` (phrase | moral value counts).
+    """
+
+    def __init__(self, vocabulary: np.ndarray, codes: np.ndarray, counts: np.ndarray):
+        """
+        :param vocabulary: array of the distinct phrases
+        :param codes: position in vocabulary of the phrase of every row
+        :param counts: int matrix of shape (rows, len(MORAL_ORDER))
+        """
+        if counts.shape != (len(codes), len(MORAL_ORDER)):
+            raise ValueError(f"counts must be of shape ({len(codes)}, {len(MORAL_ORDER)}), got: {counts.shape}")
+        self.vocabulary = np.asarray(vocabulary, dtype=object)
+        self.codes = np.asarray(codes, dtype=np.int64)
+        self.counts = counts
+        self._lookup = None
+
+    @classmethod
+    def from_spans(cls, phrases: Series, morals: Series, row_ids: Series = None):
+        """
+        counts (phrase, moral value) pairs, eg. of the span table.
+        :param phrases: Series of (lemmatized) phrases
+        :param morals: Series of moral values aligned to phrases
+        :param row_ids: Series of the source row ids aligned to phrases, None to aggregate
+        :return: PhraseMoralMatrix
+        """
+        phrase_col, counts = count_codes(phrases, morals, row_ids)
+        return cls._from_phrases(phrase_col, counts)
+
+    @classmethod
+    def from_frame(cls, data: DataFrame):
+        """
+        reads the csv layout: a 'phrase' column (or index) and one count column per moral value. Missing moral values
+        count 0, other columns are ignored.
+        :param data: DataFrame
+        :return: PhraseMoralMatrix
+        """
+        if "phrase" not in data.columns:
+            data = data.reset_index()
+        counts = np.zeros((len(data), len(MORAL_ORDER)), dtype=np.int64)
+        for position, moral in enumerate(MORAL_ORDER):
+            if moral in data.columns:
+                counts[:, position] = data[moral].fillna(0).to_numpy(dtype=np.int64)
+        return cls._from_phrases(data["phrase"].to_numpy(dtype=object), counts)
+
+    @classmethod
+    def from_csv(cls, path: str | Path):
+        """
+        :param path: path to a csv written by `occurrences_to_csv`
+        :return: PhraseMoralMatrix
+        """
+        return cls.from_frame(pd.read_csv(path))
+
+    @classmethod
+    def concat(cls, matrices: Iterable, aggregate: bool = True):
+        """
+        merges matrices, eg. of several files.
+        :param matrices: iterable of PhraseMoralMatrix
+        :param aggregate: whether to sum up the rows of the same phrase
+        :return: PhraseMoralMatrix
+        """
+        matrices = list(matrices)
+        if not matrices:
+            return cls._from_phrases(np.array([], dtype=object), np.zeros((0, len(MORAL_ORDER)), dtype=np.int64))
+        merged = cls._from_phrases(np.concatenate([matrix.phrases for matrix in matrices]),
+                                   np.vstack([matrix.counts for matrix in matrices]))
+        return merged.aggregate() if aggregate else merged
+
+    @classmethod
+    def _from_phrases(cls, phrases: np.ndarray, counts: np.ndarray):
+        codes, vocabulary = pd.factorize(phrases, use_na_sentinel=False)
+        return cls(np.asarray(vocabulary, dtype=object), codes, counts)
+
+    @property
+    def phrases(self) -> np.ndarray:
+        """
+        :return: array of the phrase of every row
+        """
+        return self.vocabulary[self.codes]
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.counts.shape
+
+    def aggregate(self, sort: bool = False):
+        """
+        sums up the rows of the same phrase.
+        :param sort: whether to sort the phrases, otherwise they are in the order of first occurrence
+        :return: PhraseMoralMatrix with one row per phrase
+        """
+        codes, used = pd.factorize(self.codes, sort=False)
+        vocabulary = self.vocabulary[np.asarray(used)]
+        if sort:
+            order = np.asarray(pd.Index(vocabulary).argsort())
+            codes = np.argsort(order)[codes]
+            vocabulary = vocabulary[order]
+        counts = np.zeros((len(vocabulary), len(MORAL_ORDER)), dtype=self.counts.dtype)
+        np.add.at(counts, codes, self.counts)
+        return PhraseMoralMatrix(vocabulary, np.arange(len(vocabulary)), counts)
+
+    def rows(self, phrases: str | List[str]):
+        """
+        slices the rows of phrases.
+        :param phrases: phrase or list of phrases
+        :return: PhraseMoralMatrix of all rows of these phrases
+        """
+        if isinstance(phrases, str):
+            phrases = [phrases]
+        lookup = self._phrase_lookup()
+        wanted = [lookup[phrase] for phrase in phrases if phrase in lookup]
+        mask = np.isin(self.codes, wanted)
+        return PhraseMoralMatrix(self.vocabulary, self.codes[mask], self.counts[mask])
+
+    def phrase(self, phrase: str) -> Series:
+        """
+        the moral profile of a phrase.
+        :param phrase: str
+        :return: Series of the summed up counts of the phrase indexed by moral value
+        """
+        return Series(self.rows(phrase).counts.sum(axis=0), index=MORAL_ORDER, name=phrase)
+
+    def column(self, moral: str) -> Series:
+        """
+        slices the counts of a moral value.
+        :param moral: moral value
+        :return: Series of the counts of every row indexed by phrase
+        """
+        return Series(self.counts[:, moral_position(moral)], index=self.phrases, name=moral)
+
+    def top_k(self, moral: str, k: int = 10) -> Series:
+        """
+        the phrases most often labeled with a moral value, rows of the same phrase are summed up first.
+        :param moral: moral value
+        :param k: number of phrases
+        :return: Series of counts indexed by phrase, descending
+        """
+        aggregated = self.aggregate() if len(self.codes) != len(self.vocabulary) else self
+        values = aggregated.counts[:, moral_position(moral)]
+        k = min(k, len(values))
+        if k == 0:
+            return Series([], dtype=values.dtype, name=moral)
+        top = np.argpartition(-values, k - 1)[:k]
+        # ties keep the order of the phrases
+        top = top[np.lexsort((top, -values[top]))]
+        return Series(values[top], index=aggregated.phrases[top], name=moral)
+
+    def totals(self) -> Series:
+        """
+        the counts of every moral value, like the `MoralDistributionFilter`.
+        :return: Series indexed by moral value
+        """
+        return Series(self.counts.sum(axis=0), index=MORAL_ORDER)
+
+    def to_frame(self) -> DataFrame:
+        """
+        :return: DataFrame in the csv layout (phrase | moral value counts)
+        """
+        df = DataFrame(self.counts, columns=MORAL_ORDER)
+        df.insert(0, "phrase", self.phrases)
+        return df
+
+    def to_csv(self, path: str | Path) -> None:
+        """
+        writes the matrix in the csv layout of `occurrences_to_csv`.
+        :param path: path of the csv
+        :return: None
+        """
+        self.to_frame().to_csv(path, index=False)
+
+    def _phrase_lookup(self) -> dict:
+        if self._lookup is None:
+            self._lookup = {phrase: code for code, phrase in enumerate(self.vocabulary)}
+        return self._lookup
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __repr__(self):
+        return f"PhraseMoralMatrix({len(self.codes)} rows, {len(self.vocabulary)} phrases)"
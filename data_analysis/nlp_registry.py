@@ -0,0 +1,95 @@
+import gc
+import threading
+from importlib import metadata
+
+# language prefix of the file names mapped to the spaCy model used for it
+LANGUAGE_MODELS = {
+    "DE": "de_core_news_lg",
+    "EN": "en_core_web_lg",
+    "FR": "fr_core_news_lg",
+    "IT": "it_core_news_lg",
+}
+
+
+class ModelRegistry:
+    """
+    Process wide registry of spaCy models. Every model is loaded lazily on first use and at most once per process,
+    then shared across files and Analyzer instances. Call `release()` to drop models under memory pressure.
+    """
+    _models = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, model_name: str):
+        """
+        get a model, loading it on first use.
+        :param model_name: name of the spaCy model, eg. 'de_core_news_lg'
+        :return: spaCy Language
+        """
+        with cls._lock:
+            if model_name not in cls._models:
+                # spaCy is slow to import, so only when the first model is needed
+                import spacy
+                print(f"loading spaCy model: {model_name}")
+                cls._models[model_name] = spacy.load(model_name)
+            return cls._models[model_name]
+
+    @classmethod
+    def for_file(cls, file_name: str):
+        """
+        get the model for a file by its language prefix (EN, DE, FR, IT).
+        :param file_name: name of the file
+        :return: spaCy Language or None for unsupported languages
+        """
+        model_name = cls.model_name(file_name)
+        if model_name is None:
+            print("unsupported language or file name. Supported language prefixes are: "
+                  + ", ".join(LANGUAGE_MODELS))
+            return None
+        return cls.get(model_name)
+
+    @staticmethod
+    def model_name(file_name: str) -> str | None:
+        """
+        :param file_name: name of the file
+        :return: name of the model for the language prefix of the file or None
+        """
+        for prefix, model_name in LANGUAGE_MODELS.items():
+            if file_name.startswith(prefix):
+                return model_name
+        return None
+
+    @staticmethod
+    def model_version(model_name: str | None) -> str:
+        """
+        gets the version of an installed model without loading it.
+        :param model_name: name of the model
+        :return: version or "" if the model isn't installed (or None)
+        """
+        if model_name is None:
+            return ""
+        try:
+            return metadata.version(model_name)
+        except metadata.PackageNotFoundError:
+            return ""
+
+    @classmethod
+    def release(cls, model_name: str = None) -> None:
+        """
+        drops a model (or all models) from the registry, so its memory can be freed once nothing else references it.
+        :param model_name: name of the model, all models if None
+        :return: None
+        """
+        with cls._lock:
+            if model_name is None:
+                cls._models.clear()
+            else:
+                cls._models.pop(model_name, None)
+        gc.collect()
+
+    @classmethod
+    def loaded(cls) -> list[str]:
+        """
+        :return: names of the models that are currently loaded
+        """
+        return list(cls._models)
@@ -0,0 +1,133 @@
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple, Type
+
+import pandas as pd
+from pandas import DataFrame
+
+from data_analysis.data_filter import DataFilter, ConcatMultipleDataFrames, Void, combine_results
+
+
+class PartitionedDataset:
+    """
+    Occurrence results (csvs in the layout of `occurrences_to_csv`) on disk, split into partitions, eg. one per source
+    file or per category. Stands for the concatenation of all csvs in order, but filters run on one partition at a
+    time, so only a single partition and the partial results are held in memory. The result is the same as running
+    the filters on the concatenated DataFrames.
+    """
+
+    def __init__(self, partitions: Dict[str, List[str | Path]]):
+        """
+        :param partitions: dictionary mapping the name of a partition to the paths of its csvs
+        """
+        if not partitions:
+            raise ValueError("At least one partition must be provided.")
+        self.partitions = {name: [Path(path) for path in paths] for name, paths in partitions.items()}
+        self._columns = None
+
+    @classmethod
+    def from_dir(cls, path: str | Path, pattern: str = "*_occurrences.csv"):
+        """
+        one partition per csv of a dir (eg. the `out_dir` of `occurrences_to_csv`), in sorted order.
+        :param path: path to the dir
+        :param pattern: glob pattern of the csvs
+        :return: PartitionedDataset
+        """
+        files = sorted(Path(path).glob(pattern))
+        if not files:
+            raise ValueError(f"No files matching '{pattern}' in {path}.")
+        return cls({file.stem: [file] for file in files})
+
+    @classmethod
+    def from_data_dict(cls, data_dict: dict):
+        """
+        one partition per category of a data_dict.
+        :param data_dict: dictionary mapping a category (eg. 'Leserbriefe' or 'POS') to the paths of the csvs
+        :return: PartitionedDataset
+        """
+        return cls(data_dict)
+
+    @property
+    def columns(self) -> pd.Index:
+        """
+        the columns of the concatenated csvs: all columns in order of first appearance, only the headers are read.
+        :return: pd.Index
+        """
+        if self._columns is None:
+            headers = [pd.read_csv(path, nrows=0).columns for path in self.paths()]
+            self._columns = pd.concat([DataFrame(columns=header) for header in headers]).columns
+        return self._columns
+
+    def paths(self) -> List[Path]:
+        return [path for paths in self.partitions.values() for path in paths]
+
+    def iter_partitions(self) -> Iterator[Tuple[str, DataFrame]]:
+        """
+        reads the partitions one by one. Columns missing in a partition are added as NaN, like when concatenating all
+        csvs.
+        :return: iterator of (name, DataFrame)
+        """
+        columns = self.columns
+        for name, paths in self.partitions.items():
+            frames = [pd.read_csv(path) for path in paths]
+            data = frames[0] if len(frames) == 1 else pd.concat(frames)
+            if not data.columns.equals(columns):
+                data = data.reindex(columns=columns)
+            yield name, data
+
+    def load(self) -> DataFrame:
+        """
+        reads all partitions into one DataFrame, only for data that fits into memory.
+        :return: DataFrame
+        """
+        return pd.concat([pd.read_csv(path) for path in self.paths()])
+
+    def filter(self, filter_stack: Type[DataFilter] | List[Type[DataFilter]], *args, **kwargs):
+        """
+        runs a DataFilter or a stack of them (like a FilterSequence) on the concatenated csvs, one partition at a time:
+        - a leading `ConcatMultipleDataFrames` and `Void` filters are skipped, the dataset already is the
+          concatenation
+        - row wise filters (`RegExFilter`, `PhraseCrossOverFilter`) run on every partition
+        - the first distributive filter after them (eg. `MoralDistributionFilter`) runs on every partition too and its
+          results are combined with its `reduce()`, all filters after it run on the combined result
+        - a streaming filter (`MoralCoOccurrenceFilter`) in its place gets the partitions one after another
+        - without a distributive filter the kept rows of all partitions are concatenated
+        :param filter_stack: DataFilter class or list of DataFilter classes
+        :return: result of the last filter
+        """
+        stack = filter_stack if isinstance(filter_stack, (list, tuple)) else [filter_stack]
+        stack = [data_filter for data_filter in stack if data_filter is not Void]
+        if stack and stack[0] is ConcatMultipleDataFrames:
+            stack = stack[1:]
+        row_wise = []
+        while len(row_wise) < len(stack) and stack[len(row_wise)].row_wise:
+            row_wise.append(stack[len(row_wise)])
+        rest = stack[len(row_wise):]
+        reducer = None
+        if rest:
+            reducer, rest = rest[0], rest[1:]
+            if not (reducer.distributive or reducer.streaming):
+                raise ValueError(f"{reducer.__name__} needs all data at once and can't run partition by partition. "
+                                 f"Only row wise filters may come before the first distributive or streaming filter.")
+
+        def filtered_partitions():
+            for name, data in self.iter_partitions():
+                print(f"filtering partition: {name}")
+                for data_filter in row_wise:
+                    data = data_filter(data).filter(*args, **kwargs)
+                yield data
+
+        if reducer is not None and not reducer.distributive:
+            result = reducer(filtered_partitions()).filter(*args, **kwargs)
+        elif reducer is not None:
+            result = reducer.reduce([reducer(data).filter(*args, **kwargs) for data in filtered_partitions()])
+        else:
+            result = combine_results(list(filtered_partitions()))
+        for data_filter in rest:
+            result = data_filter(result).filter(*args, **kwargs)
+        return result
+
+    def __len__(self):
+        return len(self.partitions)
+
+    def __repr__(self):
+        return f"PartitionedDataset({len(self.partitions)} partitions, {len(self.paths())} files)"
@@ -0,0 +1,200 @@
+import re
+import string
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame, Series
+
+# only ascii literals are looked up in the index, the case folding of any other character is left to the regex
+INDEXABLE_CHARS = set(string.ascii_letters + string.digits + string.punctuation + " ")
+REGEX_META_CHARS = set(".^$*+?{}[]\\|()")
+NGRAM = 3
+
+_fold_table = None
+
+
+def fold_table() -> dict:
+    """
+    translation table that maps every character that matches an ascii letter with re.IGNORECASE (eg. 'K', the kelvin
+    sign, or 'ſ', the long s) to the lowercase ascii letter, so folded texts contain the folded literal wherever the
+    regex matches it. Built on first use.
+    :return: dict for str.translate
+    """
+    global _fold_table
+    if _fold_table is None:
+        all_chars = "".join(map(chr, range(0xD800))) + "".join(map(chr, range(0xE000, 0x110000)))
+        table = {}
+        for letter in string.ascii_lowercase:
+            for char in set(re.findall(letter, all_chars, re.IGNORECASE)):
+                table[ord(char)] = letter
+        _fold_table = table
+    return _fold_table
+
+
+def fold(text: str) -> str:
+    """
+    case folds a text like re.IGNORECASE does for ascii letters, the length of the text is kept.
+    :param text: str
+    :return: str
+    """
+    return text.translate(fold_table())
+
+
+def required_literals(pattern: str) -> list[str]:
+    """
+    extracts the runs of literal ascii characters every match of the pattern has to contain. Conservative: only runs
+    outside of groups, char classes and escapes count, a character followed by a quantifier is left out and patterns
+    with a top level alternation or verbose mode have none.
+    :param pattern: regex pattern
+    :return: list of literal strings, empty if nothing can be extracted safely
+    """
+    literals = []
+    run = ""
+    depth = 0
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            # escapes (\d, \b, \., ...) end the run
+            literals.append(run)
+            run = ""
+            i += 2
+            continue
+        if char == "[":
+            literals.append(run)
+            run = ""
+            # skip the char class, a ']' right after '[' or '[^' is a literal
+            i += 1
+            if i < len(pattern) and pattern[i] == "^":
+                i += 1
+            if i < len(pattern) and pattern[i] == "]":
+                i += 1
+            while i < len(pattern) and pattern[i] != "]":
+                i += 2 if pattern[i] == "\\" else 1
+            i += 1
+            continue
+        if char == "(":
+            if pattern.startswith("(?", i) and "x" in re.match(r"\(\?([a-zA-Z-]*)", pattern[i:]).group(1):
+                return []
+            literals.append(run)
+            run = ""
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            return []
+        elif char in "*?{+":
+            # the quantified character is optional (or repeated), drop it from the run
+            literals.append(run[:-1])
+            run = ""
+            if char == "{":
+                # skip the bounds of the quantifier
+                while i < len(pattern) and pattern[i] != "}":
+                    i += 1
+        elif depth == 0 and char in INDEXABLE_CHARS and char not in REGEX_META_CHARS:
+            run += char
+        else:
+            literals.append(run)
+            run = ""
+        i += 1
+    literals.append(run)
+    return [literal for literal in literals if literal]
+
+
+class PhraseIndex:
+    """
+    Inverted trigram index over the distinct phrases of the 'phrase' column, reusable across regex queries on the same
+    data. A query is narrowed to the phrases that contain all trigrams of a literal the pattern requires, the regex
+    then confirms the candidates. Patterns without a safely extractable literal fall back to a scan of the distinct
+    phrases, so the result is always the same as `str.contains` on every phrase.
+    """
+
+    def __init__(self, data: DataFrame | Series):
+        phrases = data["phrase"] if isinstance(data, DataFrame) else data
+        self.phrases = phrases
+        # every distinct phrase only has to be matched once
+        self.codes, uniques = pd.factorize(phrases)
+        self.uniques = np.asarray(uniques, dtype=object)
+        self.postings = self._build(self.uniques)
+        self.queries = 0
+        self.index_hits = 0
+
+    def covers(self, phrases: Series) -> bool:
+        """
+        checks whether the index was built over these phrases.
+        :param phrases: Series
+        :return: bool
+        """
+        if phrases is self.phrases:
+            return True
+        return len(phrases) == len(self.phrases) and phrases.reset_index(drop=True).equals(
+            self.phrases.reset_index(drop=True))
+
+    def contains(self, phrases: Series, pattern: str, flags: int = 0) -> np.ndarray:
+        """
+        `phrases.str.contains(pattern, flags=flags).astype(bool)` using the index: the regex only runs on the distinct
+        phrases that contain all trigrams of the longest literal the pattern requires (or on all distinct phrases if
+        there is none) and on the rows with a missing phrase.
+        :param phrases: the Series the index was built over
+        :param pattern: regex pattern
+        :param flags: re flags
+        :return: bool array over the rows
+        """
+        candidates = self.candidates(pattern)
+        if candidates is None:
+            candidates = np.arange(len(self.uniques))
+        confirmed = Series(self.uniques[candidates], dtype=object).str.contains(pattern, flags=flags, regex=True)
+        matched = np.isin(self.codes, candidates[confirmed.astype(bool).to_numpy()])
+        missing = self.codes < 0
+        if missing.any():
+            # missing phrases are matched just like without the index
+            matched[missing] = phrases[missing].str.contains(pattern, flags=flags, regex=True).astype(bool).to_numpy()
+        return matched
+
+    def candidates(self, pattern: str) -> np.ndarray | None:
+        """
+        distinct phrases that can match the pattern: the ones that contain all trigrams of the longest required literal.
+        :param pattern: regex pattern
+        :return: sorted codes of the distinct phrases or None if the pattern can't be narrowed down
+        """
+        self.queries += 1
+        literals = [literal for literal in required_literals(pattern) if len(literal) >= NGRAM]
+        if not literals:
+            return None
+        literal = fold(max(literals, key=len))
+        grams = {literal[i:i + NGRAM] for i in range(len(literal) - NGRAM + 1)}
+        # rarest trigram first, so the intersection stays small
+        postings = sorted((self.postings.get(gram, np.array([], dtype=np.int64)) for gram in grams), key=len)
+        matched = postings[0]
+        for posting in postings[1:]:
+            if not len(matched):
+                break
+            matched = np.intersect1d(matched, posting, assume_unique=True)
+        self.index_hits += 1
+        return matched
+
+    def stats(self) -> dict:
+        """
+        :return: dict with the number of queries and how many of them could use the index
+        """
+        return {"queries": self.queries, "index_hits": self.index_hits, "phrases": len(self.uniques),
+                "ngrams": len(self.postings)}
+
+    @staticmethod
+    def _build(uniques) -> dict:
+        """
+        Helper to build the posting lists: ngram -> sorted codes of the unique phrases containing it.
+        :param uniques: unique phrases
+        :return: dict
+        """
+        postings = {}
+        for code, phrase in enumerate(uniques):
+            if not isinstance(phrase, str):
+                continue
+            folded = fold(phrase)
+            for gram in {folded[i:i + NGRAM] for i in range(len(folded) - NGRAM + 1)}:
+                postings.setdefault(gram, []).append(code)
+        return {gram: np.array(codes, dtype=np.int64) for gram, codes in postings.items()}
+
+    def __repr__(self):
+        return f"PhraseIndex({len(self.phrases)} rows, {len(self.postings)} {NGRAM}-grams)"
@@ -1,22 +1,26 @@
 from typing import Type, List
 
 import numpy as np
-import pandas as pd
-from matplotlib import pyplot as plt
-
-import matplotlib as mpl
 from pandas import Series, DataFrame
 
-from data_analysis.data_filter import DataFilter, MoralDistributionFilter
+from data_analysis.data_filter import DataFilter, MoralDistributionFilter, combine_results
+from data_analysis.filter_cache import FilterCache
 from data_analysis.filter_sequence import FilterSequence
+from data_analysis.matrix import PhraseMoralMatrix
+from data_analysis.preprocessing import MORAL_ORDER
 
 
 class Plotter:
 
     def __init__(self, config):
         self.config = config
+        # results of the pie chart filters, if "filter_cache_size" or "filter_cache_path" is set
+        self.filter_cache = FilterCache.from_config(config)
 
     def _series_to_piechart(self, data: Series, c_map, save: bool = True):
+        # matplotlib is only imported once something is plotted, it's slow to import
+        import matplotlib as mpl
+        from matplotlib import pyplot as plt
         # config colors
         cmap = mpl.colormaps[c_map]
         colors = cmap(np.linspace(0, 1, len(data)))
@@ -33,24 +37,18 @@ class Plotter:
 
     def plot_phrases(self, data_que: List[DataFrame], data_filter: Type[DataFilter | FilterSequence],
                      c_map: str = 'tab20b', save: bool = True):
-        processed_data = None
+        from matplotlib import pyplot as plt
         # process data
-        for data in data_que:
-            if processed_data is None:
-                processed_data = self._preprocess_piechart(data, data_filter)
-            else:
-                new_data = self._preprocess_piechart(data, data_filter)
-                processed_data = pd.concat([processed_data, new_data], axis=0)
-        result_df = processed_data.groupby('phrase').sum().reset_index()
-
-        as_list = self._dataframe_to_series(result_df)
-        for srs in as_list:
-            phrase = srs['phrase']
+        processed_data = self._filter_que(data_que, data_filter)
+        # one row per phrase, sorted by phrase. Missing phrases are left out like in a groupby
+        matrix = PhraseMoralMatrix.from_frame(processed_data.dropna(subset=['phrase'])).aggregate(sort=True)
+        moral_values = np.array(MORAL_ORDER)
+        for phrase, counts in zip(matrix.phrases, matrix.counts):
             print(f'processing: {phrase}')
             # init figure
-            non_zero_indices = srs.values[1:] != 0
-            labels = srs.index[1:][non_zero_indices]
-            values = srs.values[1:][non_zero_indices]  # Exclude the first element, which is the phrase
+            non_zero_indices = counts != 0
+            labels = moral_values[non_zero_indices]
+            values = counts[non_zero_indices]
             plt.figure()
             plt.pie(values, labels=labels, autopct=lambda p: f'{p:.2f}%\n({int(p * sum(values) / 100)})', startangle=90)
             plt.title(f'Moral Values Distribution for: "{phrase}"\nannotated values in total: {values.sum()}')
@@ -72,6 +70,22 @@ class Plotter:
         processed_data = cf.filter()
         return processed_data
 
+    def _filter_que(self, data_que: List[DataFrame],
+                    data_filter: Type[DataFilter | FilterSequence]) -> Series | DataFrame:
+        """
+        Helper method to filter every DataFrame of data_que and combine the results (summed up Series or
+        concatenated DataFrames). DataFilters run with `map_reduce()` on "n_workers" threads (config, default 1),
+        through the filter cache if there is one.
+        :param data_que: list of DataFrames
+        :return: Series or DataFrame
+        """
+        if isinstance(data_filter, type) and issubclass(data_filter, DataFilter):
+            n_workers = self.config.get("n_workers", 1)
+            if self.filter_cache is not None:
+                return self.filter_cache.map_reduce(data_filter, data_que, n_workers=n_workers)
+            return data_filter.map_reduce(data_que, n_workers=n_workers)
+        return combine_results([self._preprocess_piechart(data, data_filter) for data in data_que])
+
     def make_pie_chart(self, data: DataFrame, c_map: str = 'tab20b', save: bool = True) -> None:
         """
         Method to create pie chart of moral values by language
@@ -90,14 +104,8 @@ class Plotter:
         :param data_que: list of Dataframes to be processed
         :return: None
         """
-        processed_data = None
         # process data
-        for data in data_que:
-            if processed_data is None:
-                processed_data = self._preprocess_piechart(data, data_filter)
-            else:
-                processed_data += self._preprocess_piechart(data, data_filter)
-
+        processed_data = self._filter_que(data_que, data_filter)
         self._series_to_piechart(processed_data, c_map, save=save)
 
     # TODO: prevent bars form overlapping; colors from beeing reused
@@ -113,6 +121,7 @@ class Plotter:
         :param normalize: bool whether the data should be normalized
         :return: None
         """
+        from matplotlib import pyplot as plt
         categories = list(data_dict.keys())
         moral_values = data_dict[categories[0]][2].index.tolist()
         num_categories = len(categories)
@@ -165,6 +174,7 @@ class Plotter:
         length of DataFrame of category.
         :return: None
         """
+        from matplotlib import pyplot as plt
         categories = list(data_dict.keys())
         moral_values = data_dict[categories[0]][2].index.tolist()
         num_moral_values = len(moral_values)
@@ -209,10 +219,6 @@ class Plotter:
             total_annotations_cat[cat] = data_dict[cat][2].sum()
         return total_annotations_cat
 
-    def _dataframe_to_series(self, data: DataFrame) -> List[Series]:
-        list_of_series = [pd.Series(row[1]) for row in data.iterrows()]
-        return list_of_series
-
 
 if __name__ == "__main__":
     pass
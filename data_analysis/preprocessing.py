@@ -0,0 +1,175 @@
+import ast
+import re
+from typing import List
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame, Series
+
+MFT_SET = {"Care", "Harm", "Fairness", "Cheating", "Loyalty", "Betrayal", "Authority", "Subversion", "Purity",
+           "Degradation", "Liberty",
+           "Oppression", "OTHER"}
+
+# order of the moral values in the result tables
+MORAL_ORDER = ['Care', 'Harm', 'Authority', 'Subversion', 'Fairness', 'Cheating', 'Purity', 'Degradation', 'Loyalty',
+               'Betrayal', 'Liberty', 'Oppression', 'OTHER']
+MORAL_DTYPE = pd.CategoricalDtype(MORAL_ORDER)
+SPAN_TABLE_COLS = ["row_id", "moral", "phrase"]
+
+# a span is a safe split if it starts with one of the moral values
+MFT_PREFIXES = tuple(sorted(MFT_SET))
+# hashes and (typographic) quotation marks, removed after stripping the whitespace
+CLEAN_PATTERN = re.compile('[#"\u201e\u201c]')
+
+
+def moral_position(moral: str) -> int:
+    """
+    position of a moral value in MORAL_ORDER, ie. its column in the count matrices.
+    :param moral: moral value
+    :return: int
+    """
+    if moral not in MORAL_ORDER:
+        raise ValueError(f"Unknown moral value: '{moral}'. consider using one of: {', '.join(MORAL_ORDER)}")
+    return MORAL_ORDER.index(moral)
+
+
+def merge_spans(data: DataFrame, merge_cols: List[str]) -> Series:
+    """
+    Columnar counterpart to the row wise merging: splits the span columns on semicolons and stacks them into one long
+    Series. The Series is indexed by the row position in `data` and keeps the order of the row wise version
+    (all spans of the first column, then all spans of the second column, ...).
+    :param data: DataFrame containing the span columns
+    :param merge_cols: list of the span columns in the order they should be merged
+    :return: Series of span strings indexed by row position
+    """
+    cells = []
+    row_ids = []
+    for col in merge_cols:
+        col_data = data[col].to_numpy(dtype=object)
+        present = ~pd.isna(col_data)
+        cells.append(col_data[present])
+        row_ids.append(np.flatnonzero(present))
+    if not cells:
+        return Series([], dtype=object)
+    row_ids = np.concatenate(row_ids)
+    # stable sort keeps the column order within a row
+    order = np.argsort(row_ids, kind="stable")
+    cells = Series(np.concatenate(cells)[order], dtype=object)
+    # explode keeps the split order within a cell
+    spans = cells.str.split(";").explode()
+    spans.index = row_ids[order][spans.index.to_numpy()]
+    return spans
+
+
+def clean_spans(spans: Series) -> Series:
+    """
+    Columnar counterpart to the row wise cleaning: strips whitespace of every span and removes hashes and quotation
+    marks afterwards.
+    :param spans: long Series of span strings
+    :return: Series
+    """
+    return spans.str.strip().str.replace(CLEAN_PATTERN, "", regex=True)
+
+
+def validate_spans(spans: Series) -> Series:
+    """
+    Columnar counterpart to the row wise validation: every span that does not start with a moral value was split on
+    an unsafe semicolon and is glued back to the previous span of the same row.
+    :param spans: long Series of cleaned span strings indexed by row position
+    :return: Series of validated spans indexed by row position
+    """
+    if spans.empty:
+        return spans
+    row_ids = spans.index.to_numpy()
+    is_safe = spans.str.startswith(MFT_PREFIXES).to_numpy(dtype=bool, na_value=False)
+    # the first span of a row is always kept as is
+    is_first = np.ones(len(spans), dtype=bool)
+    is_first[1:] = row_ids[1:] != row_ids[:-1]
+    is_start = is_safe | is_first
+    values = spans.to_numpy(dtype=object)
+    if is_start.all():
+        return Series(values, index=row_ids, dtype=object)
+    # prefix unsafe splits with the separator and add up every run of spans starting at a safe split
+    values = values.copy()
+    values[~is_start] = "; " + values[~is_start]
+    validated = np.add.reduceat(values, np.flatnonzero(is_start))
+    return Series(validated, index=row_ids[is_start], dtype=object)
+
+
+def collapse_spans(spans: Series, index: pd.Index) -> Series:
+    """
+    turns the long Series of spans back into one list of spans per row.
+    :param spans: long Series of spans indexed by row position
+    :param index: index of the original DataFrame
+    :return: Series of lists aligned to index
+    """
+    lists = [[] for _ in range(len(index))]
+    if len(spans):
+        row_ids = spans.index.to_numpy()
+        values = spans.to_list()
+        # spans are sorted by row, so every row is one contiguous block
+        starts = np.flatnonzero(np.r_[True, row_ids[1:] != row_ids[:-1]])
+        ends = np.r_[starts[1:], len(values)]
+        for row_id, start, end in zip(row_ids[starts].tolist(), starts.tolist(), ends.tolist()):
+            lists[row_id] = values[start:end]
+    res = Series(index=index, dtype=object)
+    res[:] = lists
+    return res
+
+
+def process_spans(data: DataFrame, merge_cols: List[str]) -> Series:
+    """
+    merges, cleans and validates the span columns in one columnar pass.
+    :param data: DataFrame containing the span columns
+    :param merge_cols: list of the span columns in the order they should be merged
+    :return: Series of lists of spans, aligned to data
+    """
+    spans = merge_spans(data, merge_cols)
+    spans = clean_spans(spans)
+    spans = validate_spans(spans)
+    return collapse_spans(spans, data.index)
+
+
+def to_span_table(spans: Series, index: pd.Index = None) -> DataFrame:
+    """
+    turns a long Series of validated spans into the long-form span table: one row per span with the id of its source
+    row, the moral value as categorical (values outside of the MFT_SET become NaN) and the phrase.
+    :param spans: long Series of "Moral: phrase" strings
+    :param index: index of the source DataFrame if spans is indexed by row position, otherwise the index of spans is
+    used as row id
+    :return: DataFrame with the columns 'row_id', 'moral' and 'phrase'
+    """
+    row_ids = spans.index.to_numpy()
+    if index is not None:
+        row_ids = index.to_numpy()[row_ids]
+    sliced = spans.str.split(":", n=1)
+    moral = sliced.str[0].str.strip()
+    table = DataFrame({"row_id": row_ids,
+                       "moral": pd.Categorical(moral.to_numpy(dtype=object), dtype=MORAL_DTYPE),
+                       "phrase": sliced.str[1].str.strip().to_numpy(dtype=object)})
+    unknown = table["moral"].isna().to_numpy() & moral.notna().to_numpy()
+    if unknown.any():
+        print(f"warning - {unknown.sum()} spans don't start with a moral value, propably split on wrong semicolon")
+    no_phrase = table["phrase"].isna()
+    if no_phrase.any():
+        print(f"warning - dropping {no_phrase.sum()} spans without ':' separating moral value and phrase")
+        table = table[~no_phrase].reset_index(drop=True)
+    return table
+
+
+def span_table(data: DataFrame) -> DataFrame:
+    """
+    gets the long-form span table of processed data. Takes either a DataFrame with the 'moral_werte' lists (also as
+    read back from csv) or a span table, eg. read back from csv, whose moral values are turned categorical again.
+    :param data: DataFrame
+    :return: DataFrame with the columns 'row_id', 'moral' and 'phrase'
+    """
+    if set(SPAN_TABLE_COLS).issubset(data.columns):
+        table = data[SPAN_TABLE_COLS].copy()
+        table["moral"] = table["moral"].astype(MORAL_DTYPE)
+        return table
+    # lists come back as their string representation from csv
+    moral_werte = data["moral_werte"].map(lambda content: ast.literal_eval(content) if isinstance(content, str)
+                                          else content)
+    spans = moral_werte.explode().dropna()
+    return to_span_table(spans)